@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+
+logging.basicConfig(level=logging.INFO)
+
+
+class Overloaded(Exception):
+    """Raised when a request is rejected because the queue is full or the wait would be too long."""
+
+    def __init__(self, reason: str, estimated_wait: float):
+        super().__init__(reason)
+        self.estimated_wait = estimated_wait
+
+
+class Ticket:
+    """Admission of one request, either holding a run slot already or queued for one."""
+
+    def __init__(self, controller: "AdmissionController", position: int, estimated_wait: float, future=None):
+        self.controller = controller
+        self.position = position
+        self.estimated_wait = estimated_wait
+        self.future = future
+        self.started = None
+
+    async def __aenter__(self):
+        if self.future:
+            await self.future
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller._release(time.monotonic() - self.started)
+
+    def abandon(self) -> None:
+        """Give back the queue position or slot of a request which never ran, no-op once it ran."""
+        if self.started is not None:
+            return
+        if self.future is None or (self.future.done() and not self.future.cancelled()):
+            self.controller._release(None)
+        else:
+            self.future.cancel()
+            self.controller._forget(self.future)
+
+
+class AdmissionController:
+    """
+    Bounds in-flight tasks and queue depth in front of the chat handler.
+
+    Requests start immediately while fewer than max_in_flight run. Otherwise
+    they queue in FIFO order with a position and an estimated wait derived
+    from recent task durations. When the queue is full, or the wait would
+    exceed max_wait_seconds, the request is rejected right away with Overloaded.
+    """
+
+    def __init__(self, max_in_flight: int = 4, max_queue: int = 16, max_wait_seconds: float = 300,
+                 default_duration: float = 60, window: int = 50):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.default_duration = default_duration
+        self.durations = deque(maxlen=window)
+        self.waiters = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def average_duration(self) -> float:
+        return sum(self.durations) / len(self.durations) if self.durations else self.default_duration
+
+    def estimate_wait(self, position: int) -> float:
+        # Queued requests leave in batches of max_in_flight, each taking about the average duration
+        return math.ceil(position / self.max_in_flight) * self.average_duration()
+
+    def enter(self) -> Ticket:
+        if self.in_flight < self.max_in_flight and not self.waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return Ticket(self, 0, 0.0)
+
+        position = len(self.waiters) + 1
+        estimated_wait = self.estimate_wait(position)
+        if position > self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"queue is full ({self.max_queue} waiting)", estimated_wait)
+        if estimated_wait > self.max_wait_seconds:
+            self.rejected += 1
+            raise Overloaded(f"estimated wait of {estimated_wait:.0f}s is too long", estimated_wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self.admitted += 1
+        logging.info(f"Admission: queued at position {position}, estimated wait {estimated_wait:.0f}s")
+        return Ticket(self, position, estimated_wait, future)
+
+    def _release(self, duration) -> None:
+        if duration is not None:
+            self.durations.append(duration)
+        # Hand the slot straight to the next waiter, in_flight stays the same
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def _forget(self, future) -> None:
+        if future in self.waiters:
+            self.waiters.remove(future)
+
+    def metrics(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "average_duration_seconds": self.average_duration(),
+            "estimated_wait_seconds": self.estimate_wait(len(self.waiters) + 1) if self.waiters else 0.0,
+        }
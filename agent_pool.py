@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Callable, Optional
+
+from strands import Agent
+
+logging.basicConfig(level=logging.INFO)
+
+
+class AgentPool:
+    """
+    One agent (and message history) per chat session, bounded to max_agents.
+
+    Runs go through Agent.invoke_async, at most max_concurrency at a time,
+    the rest wait in the queue. Messages of the same session run in order.
+    """
+
+    def __init__(self, factory: Callable[[], Agent], max_agents: int = 32, max_concurrency: int = 4,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.factory = factory
+        # Releases what else the session holds, e.g. its artifacts
+        self.on_evict = on_evict
+        self.max_agents = max_agents
+        self.max_concurrency = max_concurrency
+        self.agents = OrderedDict()
+        self.session_locks = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.running = 0
+
+    def get(self, session_id: str) -> Agent:
+        if session_id in self.agents:
+            self.agents.move_to_end(session_id)
+            return self.agents[session_id]
+        logging.info(f"Creating agent for session {session_id}")
+        self.agents[session_id] = self.factory()
+        # Hooks see the session through the agent state, e.g. to attribute spans
+        self.agents[session_id].state.set("session_id", session_id)
+        self.session_locks[session_id] = asyncio.Lock()
+        self._evict(keep=session_id)
+        return self.agents[session_id]
+
+    def _evict(self, keep: str) -> None:
+        # Least recently used sessions first, never one with a run in progress
+        for session_id in list(self.agents):
+            if len(self.agents) <= self.max_agents:
+                return
+            if session_id != keep and not self.session_locks[session_id].locked():
+                logging.info(f"Evicting agent of session {session_id}")
+                del self.agents[session_id]
+                del self.session_locks[session_id]
+                if self.on_evict:
+                    self.on_evict(session_id)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str):
+        """Wait for the session to be idle and a run slot to be free, yields the session agent."""
+        agent = self.get(session_id)
+        self.queued += 1
+        waiting = True
+        try:
+            async with self.session_locks[session_id], self.semaphore:
+                self.queued -= 1
+                waiting = False
+                self.running += 1
+                try:
+                    yield agent
+                finally:
+                    self.running -= 1
+        finally:
+            # Cancelled while still queued
+            if waiting:
+                self.queued -= 1
+            self._evict(keep=session_id)
+
+    async def invoke(self, session_id: str, message: str, profile_id: Optional[str] = None):
+        async with self.slot(session_id) as agent:
+            return await agent.invoke_async(message, session_id=session_id, profile_id=profile_id)
+
+    async def stream(self, session_id: str, message: str, profile_id: Optional[str] = None):
+        async with self.slot(session_id) as agent:
+            async for event in agent.stream_async(message, invocation_state={"session_id": session_id,
+                                                                             "profile_id": profile_id}):
+                yield event
+
+    def stats(self):
+        return {"agents": len(self.agents), "running": self.running, "queued": self.queued,
+                "max_concurrency": self.max_concurrency}
@@ -0,0 +1,226 @@
+import atexit
+import logging
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Union
+
+from strands.tools import tool
+
+logging.basicConfig(level=logging.INFO)
+
+# Pages larger than this are returned as an artifact handle instead of inline text
+ARTIFACT_INLINE_CHARS = int(os.getenv("ARTIFACT_INLINE_CHARS", "20000"))
+PREVIEW_CHARS = 500
+
+
+@dataclass
+class Artifact:
+    handle: str
+    session_id: str
+    kind: str
+    path: str
+    size: int
+    created: float
+    meta: Dict = field(default_factory=dict)
+
+
+def collapse_whitespace(data: bytes) -> str:
+    return re.sub(r"\s+", " ", data.decode("utf-8", errors="replace"))
+
+
+class ArtifactStore:
+    """
+    Large payloads (page HTML, old tool results) kept in files under handles.
+
+    Reads go through mmap, so slicing, grepping and counting never load the
+    whole artifact into a Python string. Each session keeps at most
+    max_session_bytes, its oldest artifacts are deleted first.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_session_bytes: int = 64 * 1024 * 1024):
+        self.root = root or tempfile.mkdtemp(prefix="artifacts-")
+        self.max_session_bytes = max_session_bytes
+        self.artifacts = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^\w.-]", "_", session_id))
+
+    def put(self, session_id: str, data: Union[str, bytes], kind: str = "text", **meta) -> str:
+        data = data.encode("utf-8") if isinstance(data, str) else data
+        handle = f"{kind}:{uuid.uuid4().hex[:12]}"
+        session_dir = self._session_dir(session_id)
+        os.makedirs(session_dir, exist_ok=True)
+        path = os.path.join(session_dir, handle.replace(":", "_"))
+        with open(path, "wb") as f:
+            f.write(data)
+        with self.lock:
+            self.artifacts[handle] = Artifact(handle, session_id, kind, path, len(data), time.time(), meta)
+            self._evict(session_id)
+        return handle
+
+    def _evict(self, session_id: str) -> None:
+        owned = [a for a in self.artifacts.values() if a.session_id == session_id]
+        total = sum(a.size for a in owned)
+        # Keep the newest artifact even when it alone is over the limit
+        for artifact in owned[:-1]:
+            if total <= self.max_session_bytes:
+                return
+            total -= artifact.size
+            self._delete(artifact)
+
+    def _delete(self, artifact: Artifact) -> None:
+        del self.artifacts[artifact.handle]
+        try:
+            os.remove(artifact.path)
+        except OSError:
+            pass
+
+    def get(self, handle: str) -> Optional[Artifact]:
+        with self.lock:
+            return self.artifacts.get(handle)
+
+    @contextmanager
+    def view(self, handle: str):
+        """Read-only memoryview of the artifact, valid inside the with block."""
+        artifact = self.get(handle)
+        if artifact is None:
+            raise KeyError(f"Unknown or expired artifact {handle}")
+        if artifact.size == 0:
+            yield memoryview(b"")
+            return
+        with open(artifact.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+    def read(self, handle: str, start: int = 0, length: Optional[int] = None) -> bytes:
+        with self.view(handle) as view:
+            end = len(view) if length is None else start + length
+            return view[start:end].tobytes()
+
+    def text(self, handle: str, start: int = 0, length: Optional[int] = None) -> str:
+        return self.read(handle, start, length).decode("utf-8", errors="replace")
+
+    def grep(self, handle: str, pattern: str, before: int = 200, after: int = 100, max_matches: int = 20):
+        """Regex matches with surrounding context, whitespace inside the context collapsed."""
+        regex = re.compile(pattern.encode("utf-8"))
+        results = []
+        with self.view(handle) as view:
+            for match in regex.finditer(view):
+                start, end = match.span()
+                context_start = max(0, start - before)
+                context_end = min(len(view), end + after)
+                results.append({
+                    "offset": start,
+                    "match": match.group().decode("utf-8", errors="replace"),
+                    "before": collapse_whitespace(view[context_start:start].tobytes()),
+                    "after": collapse_whitespace(view[end:context_end].tobytes()),
+                    "full": collapse_whitespace(view[context_start:context_end].tobytes()),
+                })
+                if len(results) >= max_matches:
+                    break
+        return results
+
+    def count(self, handle: str, pattern: str) -> int:
+        regex = re.compile(pattern.encode("utf-8"))
+        with self.view(handle) as view:
+            return sum(1 for _ in regex.finditer(view))
+
+    def describe(self, handle: str) -> str:
+        """Short text standing in for the artifact inside a tool result."""
+        artifact = self.get(handle)
+        preview = self.text(handle, 0, PREVIEW_CHARS)
+        return (f"[artifact {handle}: {artifact.kind}, {artifact.size} bytes. "
+                f"Use grep_artifact, read_artifact or count_in_artifact to look inside]\n{preview}")
+
+    def drop_session(self, session_id: str) -> None:
+        """Delete all artifacts of the session and its directory, e.g. when the session's agent is evicted."""
+        with self.lock:
+            for artifact in [a for a in self.artifacts.values() if a.session_id == session_id]:
+                self._delete(artifact)
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def stats(self):
+        with self.lock:
+            sessions = {}
+            for artifact in self.artifacts.values():
+                sessions[artifact.session_id] = sessions.get(artifact.session_id, 0) + artifact.size
+            return {"artifacts": len(self.artifacts), "bytes": sum(sessions.values()), "sessions": sessions}
+
+    def close(self) -> None:
+        with self.lock:
+            self.artifacts.clear()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+artifact_store = ArtifactStore(max_session_bytes=int(os.getenv("ARTIFACT_SESSION_BYTES", str(64 * 1024 * 1024))))
+# The temp directory goes with the process
+atexit.register(artifact_store.close)
+
+
+@tool
+def read_artifact(handle: str, start: int = 0, length: int = 4000) -> str:
+    """
+    Read part of an artifact (stored page HTML or tool result).
+
+    Args:
+        handle: Artifact handle, e.g. html:1a2b3c4d5e6f.
+        start: Byte offset to start reading from, grep_artifact returns offsets of matches.
+        length: Number of bytes to read.
+    """
+    try:
+        return artifact_store.text(handle, start, min(length, 20000))
+    except KeyError as e:
+        return f"Error: {e}. Run the original tool again."
+
+
+@tool
+def grep_artifact(handle: str, pattern: str, before: int = 200, after: int = 100, max_matches: int = 20):
+    """
+    Find a regex pattern in an artifact and return the matches with surrounding context and byte offsets.
+
+    Args:
+        handle: Artifact handle, e.g. html:1a2b3c4d5e6f.
+        pattern: Python regular expression.
+        before: Context characters before each match.
+        after: Context characters after each match.
+        max_matches: Stop after this many matches.
+    """
+    try:
+        return artifact_store.grep(handle, pattern, before, after, max_matches)
+    except KeyError as e:
+        return f"Error: {e}. Run the original tool again."
+    except re.error as e:
+        return f"Error: invalid pattern: {e}"
+
+
+@tool
+def count_in_artifact(handle: str, pattern: str):
+    """
+    Count the matches of a regex pattern in an artifact.
+
+    Args:
+        handle: Artifact handle, e.g. html:1a2b3c4d5e6f.
+        pattern: Python regular expression.
+    """
+    try:
+        return artifact_store.count(handle, pattern)
+    except KeyError as e:
+        return f"Error: {e}. Run the original tool again."
+    except re.error as e:
+        return f"Error: invalid pattern: {e}"
+
+
+ARTIFACT_TOOLS = [read_artifact, grep_artifact, count_in_artifact]
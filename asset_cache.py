@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+STATIC_RESOURCE_TYPES = {"script", "stylesheet", "font", "image"}
+# The body is handed to the browser already decoded, its length changes
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    expires: float
+
+
+def freshness_lifetime(headers: Dict[str, str]) -> Optional[float]:
+    """Seconds a shared cache may serve the response, None when it must not be stored."""
+    cache_control = headers.get("cache-control", "").lower()
+    directives = dict(
+        (part.split("=", 1) + [""])[:2] for part in re.split(r"\s*,\s*", cache_control.strip()) if part
+    )
+    if {"no-store", "private", "no-cache"} & directives.keys():
+        return None
+    for directive in ("s-maxage", "max-age"):
+        if directive in directives:
+            try:
+                lifetime = float(directives[directive].strip('"'))
+            except ValueError:
+                return None
+            return lifetime if lifetime > 0 else None
+    return None
+
+
+def shareable_response(status: int, headers: Dict[str, str]) -> bool:
+    vary = headers.get("vary", "").lower()
+    return status == 200 and "set-cookie" not in headers and "cookie" not in vary and "*" not in vary
+
+
+def cacheable_request(headers: Dict[str, str]) -> bool:
+    """Only requests without credentials may be answered from, or stored in, the shared cache."""
+    names = {name.lower() for name in headers}
+    return "cookie" not in names and "authorization" not in names
+
+
+class SharedAssetCache:
+    """
+    Static responses shared by all browser contexts, in memory and on disk.
+
+    Only GET requests for scripts, stylesheets, fonts and images carrying
+    neither a Cookie nor an Authorization header are considered. Only 200 responses without
+    Set-Cookie, not varying on cookies, and which Cache-Control allows a shared
+    cache to keep (max-age or s-maxage, not private/no-store/no-cache) are
+    stored, for their freshness lifetime. Everything else goes to the network
+    through the session context as before, so cookies and dynamic requests stay
+    isolated per session.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: int = 512 * 1024 * 1024):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        # key -> body size of the entries on disk, least recently used first
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bytes_served = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _disk_paths(self, key: str):
+        return os.path.join(self.directory, f"{key}.body"), os.path.join(self.directory, f"{key}.json")
+
+    def _load_disk_index(self) -> None:
+        """Lists the directory once at startup, afterwards the index is kept up to date in memory."""
+        bodies = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".body"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                bodies.append((stat.st_mtime, name[:-len(".body")], stat.st_size))
+        for _, key, size in sorted(bodies):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    def _remember(self, key: str, entry: CachedResponse) -> None:
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key).body)
+        self.memory[key] = entry
+        self.memory_bytes += len(entry.body)
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted.body)
+
+    def _index_disk(self, key: str, size: int) -> List[str]:
+        """Records an entry written to disk, returns the least recently used keys to delete."""
+        self.disk_bytes -= self.disk.pop(key, 0)
+        self.disk[key] = size
+        self.disk_bytes += size
+        evicted = []
+        while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+            evicted_key, evicted_size = self.disk.popitem(last=False)
+            self.disk_bytes -= evicted_size
+            evicted.append(evicted_key)
+        return evicted
+
+    async def get(self, url: str) -> Optional[CachedResponse]:
+        key = self._key(url)
+        with self.lock:
+            entry = self.memory.get(key)
+            on_disk = entry is None and key in self.disk
+        if on_disk:
+            entry = await asyncio.to_thread(self._read_disk, key)
+        with self.lock:
+            if entry and entry.expires < time.time():
+                self._forget(key)
+                expired, entry = True, None
+            else:
+                expired = False
+            if entry:
+                if key not in self.memory:
+                    self._remember(key, entry)
+                self.memory.move_to_end(key)
+                if key in self.disk:
+                    self.disk.move_to_end(key)
+                self.hits += 1
+                self.bytes_served += len(entry.body)
+            else:
+                self.misses += 1
+        if expired:
+            await asyncio.to_thread(self._remove_disk, [key])
+        return entry
+
+    async def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> bool:
+        headers = {name.lower(): value for name, value in headers.items()}
+        lifetime = freshness_lifetime(headers)
+        if lifetime is None or not shareable_response(status, headers):
+            return False
+        entry = CachedResponse(status, {k: v for k, v in headers.items() if k not in DROPPED_HEADERS},
+                               body, time.time() + lifetime)
+        key = self._key(url)
+        with self.lock:
+            self._remember(key, entry)
+            evicted = self._index_disk(key, len(body))
+            self.stores += 1
+        await asyncio.to_thread(self._write_disk, key, url, entry, evicted)
+        return True
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        body_path, meta_path = self._disk_paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return CachedResponse(meta["status"], meta["headers"], f.read(), meta["expires"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, url: str, entry: CachedResponse, evicted: List[str]) -> None:
+        self._remove_disk(evicted)
+        body_path, meta_path = self._disk_paths(key)
+        try:
+            with open(body_path, "wb") as f:
+                f.write(entry.body)
+            with open(meta_path, "w") as f:
+                json.dump({"url": url, "status": entry.status, "headers": entry.headers, "expires": entry.expires}, f)
+        except OSError as e:
+            logging.warning(f"Asset cache write failed: {e}")
+            with self.lock:
+                self.disk_bytes -= self.disk.pop(key, 0)
+
+    def _remove_disk(self, keys: List[str]) -> None:
+        for key in keys:
+            for path in self._disk_paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _forget(self, key: str) -> None:
+        """Drops the entry from both indexes, the caller removes its files off the lock."""
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key).body)
+        self.disk_bytes -= self.disk.pop(key, 0)
+
+    async def handle_route(self, route, request) -> None:
+        """context.route handler, serves shareable static assets from the cache."""
+        if request.method != "GET" or request.resource_type not in STATIC_RESOURCE_TYPES:
+            await route.continue_()
+            return
+        # request.headers leaves out the Cookie header the browser adds, all_headers has it
+        if not cacheable_request(await request.all_headers()):
+            await route.continue_()
+            return
+        entry = await self.get(request.url)
+        if entry:
+            await route.fulfill(status=entry.status, headers=entry.headers, body=entry.body)
+            return
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logging.debug("exception=<%s> | asset fetch failed, passing the request through", str(e))
+            await route.continue_()
+            return
+        await self.put(request.url, response.status, response.headers, body)
+        await route.fulfill(response=response, body=body,
+                            headers={k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS})
+
+    def metrics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "bytes_served": self.bytes_served,
+                    "memory_entries": len(self.memory), "memory_bytes": self.memory_bytes,
+                    "disk_entries": len(self.disk), "disk_bytes": self.disk_bytes}
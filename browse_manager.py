@@ -1,69 +1,403 @@
 import asyncio
+import concurrent.futures
+import os
 import threading
 import logging
+import time
+from typing import Optional
+
 from playwright.async_api import async_playwright, Page
 
+from asset_cache import SharedAssetCache
+from browser_health import BrowserHealthMonitor
+from host_limiter import HostLimiter, parse_retry_after
+from readiness import page_readiness
+from storage_state import StorageStateStore, merge_states, profile_host, state_for_host
+from telemetry import telemetry
+
 logging.basicConfig(level=logging.INFO)
 
+# Budget of one sync bridge call when the caller has no deadline
+DEFAULT_OPERATION_TIMEOUT = float(os.getenv("BROWSER_OPERATION_TIMEOUT", "30"))
+# Closing pages must also finish when the caller's deadline has already passed
+CLEANUP_TIMEOUT = 5.0
+# How long a recycle waits for pages in use to be closed before closing them anyway
+DRAIN_TIMEOUT = 30.0
+
+
+class BrowserTimeout(TimeoutError):
+    """A browser operation did not finish before its deadline, it was cancelled."""
+
+
+class SessionBusy(RuntimeError):
+    """The session already has the maximum number of browser operations outstanding."""
+
+
+def time_left(deadline: float) -> float:
+    """Seconds until a time.monotonic() deadline, raises BrowserTimeout once it passed."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise BrowserTimeout("deadline exceeded")
+    return remaining
+
 
 class BrowserManager:
-    def __init__(self):
+    def __init__(self, storage_states: Optional[StorageStateStore] = None,
+                 asset_cache: Optional[SharedAssetCache] = None,
+                 host_limiter: Optional[HostLimiter] = None, max_session_operations: int = 4,
+                 health_options: Optional[dict] = None):
+        # Memory and loop lag checks, the browser is recycled when it grows too large
+        self.health = BrowserHealthMonitor(self, **(health_options or {}))
+        self.recycling = False
+        self.recycles = 0
+        self.relaunches = 0
+        # Operations submitted through the sync bridge and not finished yet, per session
+        self.max_session_operations = max_session_operations
+        self.outstanding = {}
+        self.outstanding_lock = threading.Lock()
+        self.timeouts = 0
+        # Pages handed out by new_page and not closed yet, other pages of a context are orphans
+        self.open_pages = set()
+        # Concurrency, spacing and Retry-After pauses of navigations per host, shared by all sessions
+        self.host_limiter = host_limiter or HostLimiter()
+        # New contexts are seeded from the saved storage states of their profiles, one per profile id and host
+        self.storage_states = storage_states
+        # Static assets shared across contexts, None keeps every context on its own network cache
+        self.asset_cache = asset_cache
+        # session_id -> profiles the session browsed, in the order of first use
+        self.context_profiles = {}
         self.loop = asyncio.new_event_loop()
         self.thread = threading.Thread(
             target=self._run_loop,
             daemon=True
         )
+        # An idle loop costs nothing, started once here so a failed browser launch can simply be retried
         self.thread.start()
 
         self.playwright = None
+        self.ready = None
+        self.health_task = None
         self.browser = None
         self.contexts = {}
+        # Contexts created ahead by prewarm, handed to the first sessions without saved state
+        self.spare_contexts = []
 
-        # Start Playwright in the same loop
-        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        # Playwright and the browser are not started on import, the first operation or prewarm() starts them
+        self.start_lock = threading.Lock()
+        self.started = False
+        self.startup = {}
+
+    def start(self) -> dict:
+        """
+        Start Playwright and the browser once, returns the cold start timings.
+        A failed start raises and is retried by the next call.
+        """
+        with self.start_lock:
+            if not self.started:
+                began = time.monotonic()
+                # Start Playwright in the same loop
+                asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+                self.startup["total_seconds"] = time.monotonic() - began
+                self.started = True
+                logging.info(f"Browser cold start: {self.startup}")
+        return self.startup
+
+    def prewarm(self, spare_contexts: int = 0) -> concurrent.futures.Future:
+        """
+        Start the browser in the background, e.g. while the web UI starts, and
+        create spare contexts for the first sessions. Returns a future of the
+        cold start timings.
+        """
+        future = concurrent.futures.Future()
+
+        def run():
+            try:
+                self.start()
+                if spare_contexts:
+                    self.run_sync(self._add_spare_contexts(spare_contexts), "prewarm", DEFAULT_OPERATION_TIMEOUT)
+                future.set_result(self.startup)
+            except Exception as e:
+                logging.exception("Browser prewarm failed")
+                future.set_exception(e)
+
+        threading.Thread(target=run, daemon=True, name="browser-prewarm").start()
+        return future
+
+    async def _add_spare_contexts(self, count: int) -> None:
+        began = time.monotonic()
+        await self.ready.wait()
+        self.spare_contexts.extend(await asyncio.gather(*(self._new_context(None) for _ in range(count))))
+        self.startup["spare_contexts_seconds"] = time.monotonic() - began
+        logging.info(f"{count} spare browser contexts ready in {self.startup['spare_contexts_seconds']:.2f}s")
 
     def _run_loop(self):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
     async def _start(self):
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=False, slow_mo=100)
+        # Parts which succeeded in an earlier, failed start are kept
+        if self.playwright is None:
+            began = time.monotonic()
+            self.playwright = await async_playwright().start()
+            self.startup["playwright_seconds"] = time.monotonic() - began
+        if self.ready is None:
+            # Cleared while the browser is replaced, new contexts wait for it
+            self.ready = asyncio.Event()
+        began = time.monotonic()
+        await self._launch()
+        self.startup["browser_seconds"] = time.monotonic() - began
+        self.ready.set()
+        if self.health_task is None:
+            self.health_task = asyncio.create_task(self.health.run())
         logging.info("Playwright started")
 
+    async def _launch(self):
+        for attempt in range(3):
+            try:
+                with telemetry.span("browser_operation", operation="launch"):
+                    self.browser = await self.playwright.chromium.launch(headless=False, slow_mo=100)
+                self.browser.on("disconnected", self._on_disconnected)
+                return
+            except Exception:
+                logging.exception(f"Browser launch failed (attempt {attempt + 1})")
+                await asyncio.sleep(2 ** attempt)
+        raise RuntimeError("Browser could not be launched")
+
+    def _on_disconnected(self, browser):
+        # Closed by recycle, or an old browser which was already replaced
+        if self.recycling or browser is not self.browser:
+            return
+        logging.error("Browser disconnected, relaunching")
+        self.relaunches += 1
+        asyncio.ensure_future(self._replace_browser("disconnected", drain=False))
+
+    async def recycle(self, reason: str):
+        """Replace the browser with a fresh one, contexts are recreated from their saved storage state."""
+        if self.recycling:
+            return
+        logging.warning(f"Recycling browser: {reason}")
+        self.recycles += 1
+        await self._replace_browser(reason, drain=True)
+
+    async def _replace_browser(self, reason: str, drain: bool):
+        self.recycling = True
+        self.ready.clear()
+        started = time.monotonic()
+        try:
+            if drain:
+                deadline = time.monotonic() + DRAIN_TIMEOUT
+                while self.open_pages and time.monotonic() < deadline:
+                    await asyncio.sleep(0.5)
+                # Only into the profiles the session browsed with (storage_profile), nothing else is written
+                for session_id in list(self.contexts):
+                    try:
+                        await self.save_storage_state(session_id)
+                    except Exception as e:
+                        logging.warning(f"Saving storage state of {session_id} before recycle failed: {e}")
+                try:
+                    await self.browser.close()
+                except Exception as e:
+                    logging.debug("exception=<%s> | closing the old browser failed", str(e))
+            # Contexts die with the browser, get_context recreates them warm from their profiles
+            self.contexts.clear()
+            self.spare_contexts.clear()
+            self.open_pages.clear()
+            await self._launch()
+            logging.info(f"Browser replaced ({reason})")
+            telemetry.record("browser_operation", time.monotonic() - started, {"operation": "replace_browser"},
+                             reason=reason)
+        finally:
+            self.recycling = False
+            self.ready.set()
+
+    def metrics(self):
+        return {
+            "contexts": len(self.contexts),
+            "open_pages": len(self.open_pages),
+            "outstanding_operations": sum(self.outstanding.values()),
+            "timeouts": self.timeouts,
+            "recycles": self.recycles,
+            "spare_contexts": len(self.spare_contexts),
+            **{f"cold_start_{name}": value for name, value in self.startup.items()},
+            "relaunches": self.relaunches,
+            **self.health.metrics(),
+        }
+
     # ---------- ASYNC API (same loop only) ----------
 
-    async def get_context(self, session_id: str):
+    async def get_context(self, session_id: str, profile: Optional[str] = None):
+        await self.ready.wait()
+        # A context recreated after a recycle is seeded from all profiles the session used
+        profiles = self.context_profiles.setdefault(session_id, [])
+        if profile and profile not in profiles:
+            profiles.append(profile)
+            context = self.contexts.get(session_id)
+            state = self.storage_states.load(profile) if context and self.storage_states else None
+            if state and state.get("cookies"):
+                # The context already exists, a host browsed later still gets its cookies. Its
+                # localStorage and IndexedDB are only restored when the context is created
+                await context.add_cookies(state["cookies"])
         if session_id not in self.contexts:
-            logging.info(f"Creating new context: {session_id}")
-            context = await self.browser.new_context()
+            state = merge_states([state for state in (self.storage_states.load(p) for p in profiles) if state]) \
+                if self.storage_states else None
+            if state is None and self.spare_contexts:
+                logging.info(f"Using spare context: {session_id}")
+                context = self.spare_contexts.pop()
+            else:
+                logging.info(f"Creating new context: {session_id} ({'warm from ' + ', '.join(profiles) if state else 'cold'})")
+                with telemetry.span("browser_operation", session_id, operation="new_context"):
+                    context = await self._new_context(state)
             self.contexts[session_id] = context
         return self.contexts[session_id]
 
-    async def new_page(self, session_id: str):
-        context = await self.get_context(session_id)
-        return await context.new_page()
+    async def _new_context(self, state: Optional[dict]):
+        context = await self.browser.new_context(storage_state=state)
+        if self.asset_cache:
+            await context.route("**/*", self.asset_cache.handle_route)
+        return context
+
+    async def save_storage_state(self, session_id: str, profile: Optional[str] = None) -> int:
+        """
+        Snapshot cookies, localStorage and IndexedDB of the session context into
+        profile, or into every profile of the session without one. A profile only
+        gets the cookies and origins of its own host. Returns the versions written.
+        """
+        profiles = [profile] if profile else self.context_profiles.get(session_id, [])
+        context = self.contexts.get(session_id)
+        if not self.storage_states or not profiles or not context:
+            return 0
+        with telemetry.span("browser_operation", session_id, operation="save_storage_state"):
+            try:
+                state = await context.storage_state(indexed_db=True)
+            except TypeError:
+                # Playwright before 1.51 can't capture IndexedDB
+                state = await context.storage_state()
+            saved = [self.storage_states.save(p, state_for_host(state, profile_host(p))) for p in profiles]
+            return sum(1 for version in saved if version)
+
+    async def new_page(self, session_id: str, profile: Optional[str] = None):
+        context = await self.get_context(session_id, profile)
+        with telemetry.span("browser_operation", session_id, operation="new_page"):
+            page = await context.new_page()
+        self.open_pages.add(page)
+        # Count requests from the start, readiness waits need to see the navigation requests
+        page_readiness.track(page)
+        return page
+
+    async def navigate(self, page: Page, url: str, retries: int = 1, **goto_options):
+        """page.goto within the host limits, a 429/503 pauses the host and is retried after its Retry-After."""
+        for attempt in range(retries + 1):
+            async with self.host_limiter.slot(url):
+                with telemetry.span("browser_operation", operation="navigate"):
+                    response = await page.goto(url, **goto_options)
+            if response is None or response.status not in (429, 503):
+                return response
+            pause = self.host_limiter.throttle(url, parse_retry_after(response.headers.get("retry-after")))
+            if attempt == retries or pause >= self.host_limiter.max_retry_after:
+                return response
+        return response
 
     async def close_page(self, page: Page):
+        self.open_pages.discard(page)
         if page.is_closed():
             return
-        await page.close()
+        with telemetry.span("browser_operation", operation="close_page"):
+            await page.close()
+
+    async def close_orphan_pages(self, session_id: str) -> int:
+        """Close pages of the session context which no caller holds, e.g. left by a cancelled new_page."""
+        context = self.contexts.get(session_id)
+        orphans = [page for page in context.pages if page not in self.open_pages] if context else []
+        for page in orphans:
+            await page.close()
+        if orphans:
+            logging.info(f"Closed {len(orphans)} orphaned pages of {session_id}")
+        return len(orphans)
 
     # ---------- SYNC BRIDGE (for tools) ----------
 
-    def new_page_sync(self, session_id: str):
-        future = asyncio.run_coroutine_threadsafe(
-            self.new_page(session_id),
-            self.loop
-        )
-        return future.result()
+    def run_sync(self, coro, session_id: str, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the manager loop and wait at most timeout seconds for it.
+        On timeout the coroutine is cancelled and BrowserTimeout raised. Raises
+        SessionBusy without running it when the session has too many operations outstanding.
+        """
+        self.start()
+        with self.outstanding_lock:
+            if self.outstanding.get(session_id, 0) >= self.max_session_operations:
+                coro.close()
+                raise SessionBusy(f"{self.max_session_operations} browser operations already running for {session_id}")
+            self.outstanding[session_id] = self.outstanding.get(session_id, 0) + 1
+
+        timeout = timeout if timeout is not None else DEFAULT_OPERATION_TIMEOUT
+        # Time as the caller sees it, the operation spans inside exclude waiting for the loop
+        with telemetry.span("browser_bridge", session_id, operation=getattr(coro, "__name__", "operation")):
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+            # Counted until the coroutine really ended, a cancelled one may still be unwinding
+            future.add_done_callback(lambda _: self._finished(session_id))
+            try:
+                return future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                self.timeouts += 1
+                raise BrowserTimeout(f"browser operation for {session_id} timed out after {timeout:.1f}s")
 
-    def close_page_sync(self, page: Page):
+    def _finished(self, session_id: str) -> None:
+        with self.outstanding_lock:
+            self.outstanding[session_id] -= 1
+            if not self.outstanding[session_id]:
+                del self.outstanding[session_id]
+
+    def new_page_sync(self, session_id: str, profile: Optional[str] = None, timeout: Optional[float] = None):
+        try:
+            return self.run_sync(self.new_page(session_id, profile), session_id, timeout)
+        except BrowserTimeout:
+            # The page may have been created after all, nobody would ever close it
+            asyncio.run_coroutine_threadsafe(self.close_orphan_pages(session_id), self.loop)
+            raise
+
+    def save_storage_state_sync(self, session_id: str, profile: Optional[str] = None,
+                                timeout: Optional[float] = None):
+        return self.run_sync(self.save_storage_state(session_id, profile), session_id, timeout)
+
+    def close_page_sync(self, page: Page, timeout: float = CLEANUP_TIMEOUT):
+        # Not counted against the session cap, cleanup must always be possible
+        if not self.started:
+            return
         future = asyncio.run_coroutine_threadsafe(
             self.close_page(page),
             self.loop
         )
-        return future.result()
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            logging.warning("Closing a page timed out")
 
 
-browser_manager = BrowserManager()
+# Opt-in, set STORAGE_STATE_DIR to keep the logins and cookies of each session per host on disk
+STORAGE_STATE_DIR = os.getenv("STORAGE_STATE_DIR")
+# Opt-in, set ASSET_CACHE_DIR to share static assets between session contexts
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR")
+browser_manager = BrowserManager(
+    StorageStateStore(
+        STORAGE_STATE_DIR,
+        ttl_seconds=float(os.getenv("STORAGE_STATE_TTL_SECONDS", str(7 * 24 * 3600))),
+    ) if STORAGE_STATE_DIR else None,
+    SharedAssetCache(
+        ASSET_CACHE_DIR,
+        max_memory_bytes=int(os.getenv("ASSET_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024))),
+        max_disk_bytes=int(os.getenv("ASSET_CACHE_DISK_BYTES", str(512 * 1024 * 1024))),
+    ) if ASSET_CACHE_DIR else None,
+    HostLimiter(
+        max_concurrent=int(os.getenv("HOST_MAX_CONCURRENT_NAVIGATIONS", "2")),
+        min_interval=float(os.getenv("HOST_MIN_NAVIGATION_INTERVAL", "1.0")),
+        burst=int(os.getenv("HOST_NAVIGATION_BURST", "2")),
+    ),
+    max_session_operations=int(os.getenv("MAX_SESSION_BROWSER_OPERATIONS", "4")),
+    health_options={
+        "max_total_memory_mb": int(os.getenv("BROWSER_MAX_MEMORY_MB", "2048")),
+        "max_renderer_memory_mb": int(os.getenv("BROWSER_MAX_RENDERER_MEMORY_MB", "1024")),
+        "interval": float(os.getenv("BROWSER_HEALTH_INTERVAL", "15")),
+    },
+)
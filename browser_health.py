@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List
+
+logging.basicConfig(level=logging.INFO)
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_children() -> Dict[int, List[int]]:
+    """ppid -> pids of all processes, read from /proc. Empty where /proc is not available."""
+    children: Dict[int, List[int]] = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return children
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The command name may contain spaces, ppid is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(pid)
+    return children
+
+
+def child_processes(root_pid: int, children: Dict[int, List[int]] = None) -> List[int]:
+    """All descendants of root_pid."""
+    children = process_children() if children is None else children
+    descendants, pending = [], [root_pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            descendants.append(child)
+            pending.append(child)
+    return descendants
+
+
+def process_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_pss(pid: int) -> int:
+    """
+    Proportional set size, pages shared between the browser processes are
+    split between them, so a sum over the processes does not count them twice.
+    Falls back to the RSS where smaps_rollup is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return process_rss(pid)
+
+
+def process_cmdline(pid: int) -> bytes:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+
+def is_renderer(pid: int) -> bool:
+    return b"--type=renderer" in process_cmdline(pid)
+
+
+def browser_processes(parent_pid: int) -> List[int]:
+    """
+    The Playwright drivers started by parent_pid and everything below them
+    (browser, GPU and renderer processes). Other children of parent_pid are
+    not part of the browser and are left out.
+    """
+    children = process_children()
+    drivers = [pid for pid in children.get(parent_pid, []) if b"run-driver" in process_cmdline(pid)]
+    return drivers + [pid for driver in drivers for pid in child_processes(driver, children)]
+
+
+class BrowserHealthMonitor:
+    """
+    Watches the browser from the BrowserManager loop.
+
+    Every interval seconds it measures the memory of the browser processes (the
+    playwright driver of this process and its browser and renderers) as PSS
+    and the lag of the event loop. RSS would count the memory shared by the
+    processes once per process. When the total or a single renderer crosses its
+    limit, the manager recycles the browser.
+    """
+
+    def __init__(self, manager, max_total_memory_mb: int = 2048, max_renderer_memory_mb: int = 1024,
+                 interval: float = 15, max_loop_lag: float = 1.0):
+        self.manager = manager
+        self.max_total_memory = max_total_memory_mb * 1024 * 1024
+        self.max_renderer_memory = max_renderer_memory_mb * 1024 * 1024
+        self.interval = interval
+        self.max_loop_lag = max_loop_lag
+        self.total_memory = 0
+        self.max_renderer = 0
+        self.loop_lag = 0.0
+        self.max_seen_loop_lag = 0.0
+        self.checks = 0
+
+    def measure(self) -> None:
+        pids = browser_processes(os.getpid())
+        memory = {pid: process_pss(pid) for pid in pids}
+        self.total_memory = sum(memory.values())
+        self.max_renderer = max((size for pid, size in memory.items() if is_renderer(pid)), default=0)
+
+    def unhealthy_reason(self):
+        if self.total_memory > self.max_total_memory:
+            return f"browser memory {self.total_memory // 2 ** 20}MB over {self.max_total_memory // 2 ** 20}MB"
+        if self.max_renderer > self.max_renderer_memory:
+            return f"renderer memory {self.max_renderer // 2 ** 20}MB over {self.max_renderer_memory // 2 ** 20}MB"
+        return None
+
+    async def run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            # A busy loop wakes the sleep late, the delay is the lag every browser operation sees as well
+            self.loop_lag = max(0.0, time.monotonic() - expected)
+            self.max_seen_loop_lag = max(self.max_seen_loop_lag, self.loop_lag)
+            if self.loop_lag > self.max_loop_lag:
+                logging.warning(f"Browser loop lagging {self.loop_lag:.2f}s")
+            try:
+                # /proc scanning is blocking file IO, keep it off the loop
+                await asyncio.to_thread(self.measure)
+                self.checks += 1
+                reason = self.unhealthy_reason()
+                if reason:
+                    await self.manager.recycle(reason)
+            except Exception:
+                logging.exception("Browser health check failed")
+
+    def metrics(self):
+        return {
+            "browser_pss_bytes": self.total_memory,
+            "max_renderer_pss_bytes": self.max_renderer,
+            "loop_lag_seconds": self.loop_lag,
+            "max_loop_lag_seconds": self.max_seen_loop_lag,
+            "checks": self.checks,
+        }
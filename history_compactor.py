@@ -0,0 +1,80 @@
+import logging
+from typing import Any
+
+from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent
+
+from artifacts import ArtifactStore, artifact_store
+
+logging.basicConfig(level=logging.INFO)
+
+# Tool results shorter than this are cheaper to keep than to stub
+MIN_COMPACT_CHARS = 500
+PREVIEW_CHARS = 200
+IMAGE_STUB = "[image removed from history after it was answered]"
+# Results which already point into the artifact store
+STUB_PREFIXES = ("[compacted", "[artifact")
+
+
+class HistoryCompactor(HookProvider):
+    """
+    Shrinks the agent history before every model call.
+
+    - Tool results which the model has seen more than `keep_turns` assistant
+      turns ago are moved to the artifact store, a short stub with the handle stays.
+    - Image blocks are dropped as soon as an assistant turn has answered them.
+    """
+
+    def __init__(self, keep_turns: int = 2, store: ArtifactStore = artifact_store):
+        self.keep_turns = keep_turns
+        self.store = store
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        registry.add_callback(event_type=BeforeModelCallEvent, callback=self.before_model_call)
+
+    def before_model_call(self, event: BeforeModelCallEvent) -> None:
+        self.compact(event.agent.messages, event.agent.state.get("session_id") or event.agent.name)
+
+    def _stub(self, session_id: str, text: str) -> dict:
+        handle = self.store.put(session_id, text, "result")
+        return {"text": f"[compacted tool result: {len(text)} chars, handle={handle}, "
+                        f"use read_artifact or grep_artifact to read it again] {text[:PREVIEW_CHARS]}"}
+
+    def _compact_tool_result(self, session_id: str, tool_result: dict, compact_text: bool) -> int:
+        saved = 0
+        content = []
+        for block in tool_result.get("content", []):
+            if "image" in block:
+                content.append({"text": IMAGE_STUB})
+                saved += len(block["image"].get("source", {}).get("bytes", b""))
+            elif compact_text and len(block.get("text", "")) >= MIN_COMPACT_CHARS and not block["text"].startswith(STUB_PREFIXES):
+                stub = self._stub(session_id, block["text"])
+                saved += len(block["text"]) - len(stub["text"])
+                content.append(stub)
+            else:
+                content.append(block)
+        tool_result["content"] = content
+        return saved
+
+    def compact(self, messages: list, session_id: str = "default") -> int:
+        saved = 0
+        later_turns = 0
+        # Walk backwards counting the assistant turns which came after each message
+        for message in reversed(messages):
+            if message["role"] == "assistant":
+                later_turns += 1
+                continue
+            if later_turns == 0:
+                continue
+            content = []
+            for block in message["content"]:
+                if "image" in block:
+                    content.append({"text": IMAGE_STUB})
+                    saved += len(block["image"].get("source", {}).get("bytes", b""))
+                    continue
+                if "toolResult" in block:
+                    saved += self._compact_tool_result(session_id, block["toolResult"], later_turns > self.keep_turns)
+                content.append(block)
+            message["content"] = content
+        if saved:
+            logging.info(f"History compactor saved ~{saved} bytes")
+        return saved
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+logging.basicConfig(level=logging.INFO)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+
+    def __init__(self, max_concurrent: int, burst: int):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.bucket_lock = asyncio.Lock()
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.running = 0
+        self.navigations = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+
+class HostLimiter:
+    """
+    Politeness limits for navigations, per host.
+
+    At most max_concurrent navigations run against a host at a time. Starts are
+    spaced by a token bucket refilling one token every min_interval seconds, up
+    to burst tokens. After a 429/503 with Retry-After, the host is paused for that long.
+    Must be used from a single event loop, the BrowserManager loop.
+    """
+
+    def __init__(self, max_concurrent: int = 2, min_interval: float = 1.0, burst: int = 2,
+                 max_retry_after: float = 120):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self.burst = burst
+        self.max_retry_after = max_retry_after
+        self.hosts = {}
+
+    def _host(self, url: str) -> HostState:
+        host = (urlparse(url).hostname or "").lower()
+        if host not in self.hosts:
+            self.hosts[host] = HostState(self.max_concurrent, self.burst)
+        return self.hosts[host]
+
+    async def _take_token(self, state: HostState) -> None:
+        async with state.bucket_lock:
+            while True:
+                now = time.monotonic()
+                if state.blocked_until > now:
+                    await asyncio.sleep(state.blocked_until - now)
+                    continue
+                if self.min_interval > 0:
+                    state.tokens = min(self.burst, state.tokens + (now - state.refilled) / self.min_interval)
+                else:
+                    state.tokens = self.burst
+                state.refilled = now
+                if state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                await asyncio.sleep((1 - state.tokens) * self.min_interval)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Wait until a navigation to url may start, held for the duration of the navigation."""
+        state = self._host(url)
+        started = time.monotonic()
+        state.waiting += 1
+        waiting = True
+        try:
+            async with state.semaphore:
+                await self._take_token(state)
+                state.waiting -= 1
+                waiting = False
+                waited = time.monotonic() - started
+                state.wait_seconds += waited
+                state.max_wait_seconds = max(state.max_wait_seconds, waited)
+                state.navigations += 1
+                state.running += 1
+                if waited > 1:
+                    logging.info(f"Navigation to {urlparse(url).hostname} waited {waited:.1f}s for the host limit")
+                try:
+                    yield
+                finally:
+                    state.running -= 1
+        finally:
+            # Cancelled while still waiting for a slot or token
+            if waiting:
+                state.waiting -= 1
+
+    def throttle(self, url: str, retry_after: Optional[float]) -> float:
+        """Pause the host after a 429/503, returns the pause in seconds."""
+        state = self._host(url)
+        state.throttled += 1
+        pause = min(retry_after if retry_after is not None else self.min_interval * 5, self.max_retry_after)
+        state.blocked_until = max(state.blocked_until, time.monotonic() + pause)
+        logging.warning(f"{urlparse(url).hostname} throttled us, pausing navigations for {pause:.1f}s")
+        return pause
+
+    def metrics(self):
+        now = time.monotonic()
+        return {
+            host: {
+                "running": state.running,
+                "queued": state.waiting,
+                "navigations": state.navigations,
+                "throttled": state.throttled,
+                "average_wait_seconds": state.wait_seconds / state.navigations if state.navigations else 0.0,
+                "max_wait_seconds": state.max_wait_seconds,
+                "paused_seconds": max(0.0, state.blocked_until - now),
+            }
+            for host, state in self.hosts.items()
+        }
@@ -0,0 +1,340 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
+logging.basicConfig(level=logging.INFO)
+
+# Local sentence-transformers model for the semantic index, e.g. all-MiniLM-L6-v2. Unset keeps it BM25 only
+PAGE_INDEX_EMBEDDING_MODEL = os.getenv("PAGE_INDEX_EMBEDDING_MODEL")
+
+MAX_CHUNK_CHARS = 800
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source",
+             "track", "wbr"}
+# Elements whose text becomes one chunk
+BLOCK_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "td", "th", "dt", "dd", "pre", "blockquote",
+              "caption", "figcaption", "legend", "textarea", "select", "title"}
+# Interactive elements get their own chunk and still count as text of the enclosing block
+INTERACTIVE_TAGS = {"a", "button", "label", "option", "summary"}
+# Containers only emit the text directly inside them, their blocks are chunks of their own
+CONTAINER_TAGS = {"body", "div", "section", "article", "main", "nav", "header", "footer", "aside", "form",
+                  "table", "tr", "ul", "ol", "dl", "fieldset", "details", "figure"}
+# Start tags which close a still open element, e.g. <li>a<li>b
+IMPLIED_END = {"li": {"li"}, "option": {"option"}, "td": {"td", "th"}, "th": {"td", "th"},
+               "tr": {"tr", "td", "th"}, "dt": {"dt", "dd"}, "dd": {"dt", "dd"}}
+IMPLIED_END.update({tag: {"p"} for tag in BLOCK_TAGS | CONTAINER_TAGS - {"body"} if tag not in IMPLIED_END})
+LABEL_ATTRIBUTES = ("aria-label", "title", "alt", "placeholder", "name", "value", "type")
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+
+
+@dataclass
+class Chunk:
+    key: str
+    ref: str
+    tag: str
+    text: str
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def css_ident(value: str) -> bool:
+    return bool(re.fullmatch(r"[A-Za-z_][\w-]*", value))
+
+
+class _ChunkParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        # tag, selector, child tag counts, text parts
+        self.stack = [("", "", Counter(), [])]
+        self.skip_depth = 0
+        self.chunks: List[tuple] = []
+
+    def _selector(self, tag: str, attrs: Dict[str, str]) -> str:
+        parent_tag, parent_selector, counts, _ = self.stack[-1]
+        counts[tag] += 1
+        element_id = attrs.get("id")
+        if element_id and css_ident(element_id):
+            return f"#{element_id}"
+        step = f"{tag}:nth-of-type({counts[tag]})"
+        return f"{parent_selector} > {step}" if parent_selector else step
+
+    def _labels(self, attrs: Dict[str, str]) -> str:
+        return " ".join(f"{name}={attrs[name]}" for name in LABEL_ATTRIBUTES if attrs.get(name))
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_depth:
+            if tag in SKIPPED_TAGS:
+                self.skip_depth += 1
+            return
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = 1
+            return
+        while len(self.stack) > 1 and self.stack[-1][0] in IMPLIED_END.get(tag, ()):
+            self._close()
+        attrs = {name: value or "" for name, value in attrs}
+        selector = self._selector(tag, attrs)
+        if tag in VOID_TAGS:
+            labels = self._labels(attrs)
+            if tag in ("input", "img") and labels:
+                self.chunks.append((selector, tag, labels))
+            return
+        labels = self._labels({name: attrs[name] for name in ("aria-label", "title") if name in attrs})
+        self.stack.append((tag, selector, Counter(), [labels] if labels else []))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and not self.skip_depth:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag in SKIPPED_TAGS:
+                self.skip_depth -= 1
+            return
+        # Close unclosed children of a malformed page together with their parent, ignore stray end tags
+        if not any(frame[0] == tag for frame in self.stack[1:]):
+            return
+        while len(self.stack) > 1:
+            frame_tag = self.stack[-1][0]
+            self._close()
+            if frame_tag == tag:
+                return
+
+    def _close(self):
+        tag, selector, _, parts = self.stack.pop()
+        text = re.sub(r"\s+", " ", " ".join(parts)).strip()
+        if not text:
+            return
+        if tag in BLOCK_TAGS or tag in INTERACTIVE_TAGS or tag in CONTAINER_TAGS:
+            self.chunks.append((selector, tag, text))
+        parent_tag = self.stack[-1][0]
+        if tag not in BLOCK_TAGS | CONTAINER_TAGS and not (tag in INTERACTIVE_TAGS and parent_tag in CONTAINER_TAGS):
+            self.stack[-1][3].append(text)
+
+    def handle_data(self, data):
+        if not self.skip_depth and data.strip():
+            self.stack[-1][3].append(data)
+
+    def finish(self) -> List[tuple]:
+        self.close()
+        while len(self.stack) > 1:
+            self._close()
+        return self.chunks
+
+
+def chunk_html(html: str) -> List[Chunk]:
+    """Split a page into text chunks along its DOM structure, each with a CSS selector of its element."""
+    parser = _ChunkParser()
+    parser.feed(html)
+    chunks = []
+    seen = Counter()
+    for ref, tag, text in parser.finish():
+        for start in range(0, len(text), MAX_CHUNK_CHARS):
+            piece = text[start:start + MAX_CHUNK_CHARS]
+            identity = f"{ref}|{piece}"
+            seen[identity] += 1
+            key = hashlib.sha1(f"{identity}|{seen[identity]}".encode("utf-8")).hexdigest()[:16]
+            chunks.append(Chunk(key, ref, tag, piece))
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over chunks, chunks can be added and removed one by one."""
+
+    def __init__(self):
+        self.term_freqs: Dict[str, Counter] = {}
+        self.postings: Dict[str, set] = {}
+        self.total_length = 0
+
+    def add(self, key: str, text: str) -> None:
+        term_freq = Counter(tokenize(text))
+        self.term_freqs[key] = term_freq
+        self.total_length += sum(term_freq.values())
+        for term in term_freq:
+            self.postings.setdefault(term, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        term_freq = self.term_freqs.pop(key)
+        self.total_length -= sum(term_freq.values())
+        for term in term_freq:
+            self.postings[term].discard(key)
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def search(self, query: str, k: int) -> List[tuple]:
+        count = len(self.term_freqs)
+        if not count:
+            return []
+        average_length = self.total_length / count or 1
+        scores = Counter()
+        for term in set(tokenize(query)):
+            keys = self.postings.get(term, ())
+            if not keys:
+                continue
+            idf = math.log(1 + (count - len(keys) + 0.5) / (len(keys) + 0.5))
+            for key in keys:
+                term_freq = self.term_freqs[key]
+                freq = term_freq[term]
+                length = sum(term_freq.values())
+                scores[key] += idf * freq * (BM25_K1 + 1) / (
+                        freq + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+        return scores.most_common(k)
+
+
+class EmbeddingIndex:
+    """Cosine similarity over local sentence embeddings, computed once per chunk."""
+
+    _model = None
+    _model_lock = threading.Lock()
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.vectors = {}
+
+    def _encoder(self):
+        with EmbeddingIndex._model_lock:
+            if EmbeddingIndex._model is None:
+                EmbeddingIndex._model = SentenceTransformer(self.model_name, device="cpu")
+            return EmbeddingIndex._model
+
+    def add(self, chunks: List[Chunk]) -> None:
+        if not chunks:
+            return
+        vectors = self._encoder().encode([chunk.text for chunk in chunks], normalize_embeddings=True)
+        for chunk, vector in zip(chunks, vectors):
+            self.vectors[chunk.key] = vector
+
+    def remove(self, key: str) -> None:
+        self.vectors.pop(key, None)
+
+    def search(self, query: str, k: int) -> List[tuple]:
+        if not self.vectors:
+            return []
+        keys = list(self.vectors)
+        query_vector = self._encoder().encode([query], normalize_embeddings=True)[0]
+        scores = np.stack([self.vectors[key] for key in keys]) @ query_vector
+        top = np.argsort(-scores)[:k]
+        return [(keys[i], float(scores[i])) for i in top]
+
+
+class PageIndex:
+    """
+    Chunk index of one page, updated incrementally when the page changes.
+
+    Updates and searches hold the lock, the observer may update the index while
+    the selector searches it. set_page only remembers the page, it is indexed by
+    the next search, pages nobody searches are never chunked.
+    """
+
+    def __init__(self, embedding_model: Optional[str] = PAGE_INDEX_EMBEDDING_MODEL):
+        self.lock = threading.Lock()
+        self.chunks: Dict[str, Chunk] = {}
+        self.version = None
+        self.pending = None
+        self.bm25 = BM25Index()
+        self.embeddings = None
+        if embedding_model and SentenceTransformer is not None:
+            self.embeddings = EmbeddingIndex(embedding_model)
+        elif embedding_model:
+            logging.warning("sentence-transformers is not installed, page search uses BM25 only")
+
+    def set_page(self, html: str, version: str = None) -> None:
+        with self.lock:
+            self.pending = (html, version)
+
+    def update(self, html: str, version: str = None):
+        """Re-chunk the page and only index chunks which changed, returns (added, removed) counts."""
+        with self.lock:
+            self.pending = None
+            return self._update(html, version)
+
+    def _update(self, html: str, version: str = None):
+        if version is not None and version == self.version:
+            return 0, 0
+        chunks = {chunk.key: chunk for chunk in chunk_html(html)}
+        removed = [key for key in self.chunks if key not in chunks]
+        added = [chunk for key, chunk in chunks.items() if key not in self.chunks]
+        for key in removed:
+            self.bm25.remove(key)
+            if self.embeddings:
+                self.embeddings.remove(key)
+        for chunk in added:
+            self.bm25.add(chunk.key, chunk.text)
+        if self.embeddings:
+            self.embeddings.add(added)
+        self.chunks = chunks
+        self.version = version
+        logging.info(f"Page index updated: {len(added)} chunks added, {len(removed)} removed, {len(chunks)} total")
+        return len(added), len(removed)
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        with self.lock:
+            if self.pending:
+                html, version = self.pending
+                self.pending = None
+                self._update(html, version)
+            return self._search(query, k)
+
+    def _search(self, query: str, k: int) -> List[Dict]:
+        lexical = self.bm25.search(query, k * 4)
+        if self.embeddings:
+            # Reciprocal rank fusion of the lexical and semantic rankings
+            fused = Counter()
+            for ranking in (lexical, self.embeddings.search(query, k * 4)):
+                for rank, (key, _) in enumerate(ranking):
+                    fused[key] += 1 / (RRF_K + rank + 1)
+            ranked = fused.most_common(k)
+        else:
+            ranked = lexical[:k]
+        return [{"ref": self.chunks[key].ref, "tag": self.chunks[key].tag, "text": self.chunks[key].text,
+                 "score": round(score, 4)} for key, score in ranked]
+
+
+class PageIndexes:
+    """One PageIndex per session, the least recently used sessions are dropped beyond max_sessions."""
+
+    def __init__(self, max_sessions: int = 32):
+        self.max_sessions = max_sessions
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, session_id: str) -> PageIndex:
+        with self.lock:
+            if session_id not in self.indexes:
+                self.indexes[session_id] = PageIndex()
+                while len(self.indexes) > self.max_sessions:
+                    self.indexes.popitem(last=False)
+            self.indexes.move_to_end(session_id)
+            return self.indexes[session_id]
+
+    def update(self, session_id: str, html: str, version: str = None):
+        return self.get(session_id).update(html, version)
+
+    def set_page(self, session_id: str, html: str, version: str = None) -> None:
+        self.get(session_id).set_page(html, version)
+
+    def search(self, session_id: str, query: str, k: int = 5) -> List[Dict]:
+        return self.get(session_id).search(query, k)
+
+
+page_indexes = PageIndexes()
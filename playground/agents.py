@@ -396,6 +396,11 @@ You must determine the correct workflow path based on the step type.
     - Execute the action using the EXACT selector provided by the Selector Tool.
     - Do not modify the selector.
 
+4.  **Script Tool (run_script):**
+    - When a step needs several actions on the same page (e.g. fill every field of a form, pick an option, submit),
+      first get all selectors from the Selector Tool, then run the actions with ONE `run_script` call.
+    - It stops at the first failing action; report which action failed and its error.
+
 ---
 
 ## Loop Prevention & Recovery
@@ -0,0 +1,199 @@
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, List, Optional, Tuple
+
+import jsonschema
+from strands.models import Model
+from strands.types.streaming import StreamEvent
+
+logging.basicConfig(level=logging.INFO)
+
+CONFIDENCE = re.compile(r"confidence\W{0,5}([01](?:\.\d+)?)", re.IGNORECASE)
+
+
+@dataclass
+class CascadePolicy:
+    """When the answer of the small model is good enough for a role."""
+
+    # Escalate when the model reports a confidence lower than this
+    min_confidence: float = 0.7
+    # Final answer must contain a JSON object
+    require_json: bool = False
+    # Final answer must contain at least one of these markers
+    required_markers: Tuple[str, ...] = ()
+    # Escalate every turn which calls a tool, for roles where tool choice is the hard part
+    escalate_on_tool_use: bool = False
+
+
+ROLE_POLICIES = {
+    "orchestrator": CascadePolicy(),
+    "planner": CascadePolicy(require_json=True),
+    "observer": CascadePolicy(required_markers=("APPROVED", "REJECTED")),
+    "executor": CascadePolicy(required_markers=("EXECUTION_RESULT",)),
+    "selector": CascadePolicy(min_confidence=0.8, required_markers=("selector",)),
+    "visual": CascadePolicy(),
+}
+
+
+@dataclass
+class CascadeStats:
+    requests: int = 0
+    escalations: int = 0
+    small_seconds: float = 0.0
+    large_seconds: float = 0.0
+    reasons: dict = field(default_factory=dict)
+
+    def snapshot(self):
+        accepted = self.requests - self.escalations
+        avg_small = self.small_seconds / self.requests if self.requests else 0.0
+        avg_large = self.large_seconds / self.escalations if self.escalations else 0.0
+        return {
+            "requests": self.requests,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / self.requests if self.requests else 0.0,
+            "avg_small_seconds": avg_small,
+            "avg_large_seconds": avg_large,
+            # Large model time avoided for accepted answers minus small model time wasted on escalations
+            "estimated_saved_seconds": accepted * avg_large - self.escalations * avg_small,
+            "reasons": dict(self.reasons),
+        }
+
+
+class CascadeModel(Model):
+    """
+    Model wrapper which asks a small, fast model first and only escalates to
+    the large model when the answer does not satisfy the role policy.
+
+    The small model response is buffered, so the agent only ever sees the
+    events of the accepted model.
+    """
+
+    def __init__(self, small: Model, large: Model, role: str, policy: Optional[CascadePolicy] = None):
+        self.small = small
+        self.large = large
+        self.role = role
+        self.policy = policy or ROLE_POLICIES.get(role, CascadePolicy())
+        self.stats = CascadeStats()
+        self.lock = threading.Lock()
+        self.config = {"model_id": f"cascade:{role}", "role": role}
+
+    def update_config(self, **model_config: Any) -> None:
+        self.config.update(model_config)
+
+    def get_config(self) -> Any:
+        return {**self.config, "small": self.small.get_config(), "large": self.large.get_config()}
+
+    @staticmethod
+    def tool_call_error(name: str, tool_input: str, tool_specs: Optional[List[dict]]) -> Optional[str]:
+        """Return why a tool call does not match the tool specs offered to the model, None when it does."""
+        spec = next((spec for spec in tool_specs or [] if spec.get("name") == name), None)
+        if spec is None:
+            return "unknown_tool"
+        try:
+            arguments = json.loads(tool_input or "{}")
+        except json.JSONDecodeError:
+            return "invalid_tool_input"
+        try:
+            jsonschema.validate(arguments, spec.get("inputSchema", {}).get("json", {}))
+        except jsonschema.ValidationError:
+            return "tool_input_schema"
+        except jsonschema.SchemaError:
+            pass
+        return None
+
+    def escalation_reason(self, text: str, tool_calls: list, tool_specs: Optional[List[dict]] = None) -> Optional[str]:
+        """
+        Return why the small model answer is rejected, None when it is accepted.
+
+        tool_calls are (name, input json) pairs, each must name a tool of
+        tool_specs and its input must validate against that tool's input schema.
+        """
+        for name, tool_input in tool_calls:
+            error = self.tool_call_error(name, tool_input, tool_specs)
+            if error:
+                return error
+        confidence = CONFIDENCE.search(text)
+        if confidence and float(confidence.group(1)) < self.policy.min_confidence:
+            return "low_confidence"
+        if tool_calls:
+            return "tool_use" if self.policy.escalate_on_tool_use else None
+
+        if not text.strip():
+            return "empty"
+        if self.policy.required_markers and not any(marker in text for marker in self.policy.required_markers):
+            return "missing_marker"
+        if self.policy.require_json:
+            match = re.search(r"\{.*\}", text, re.DOTALL)
+            try:
+                json.loads(match.group() if match else "")
+            except json.JSONDecodeError:
+                return "invalid_json"
+        return None
+
+    def _record(self, small_seconds: float, large_seconds: float = 0.0, reason: Optional[str] = None):
+        with self.lock:
+            self.stats.requests += 1
+            self.stats.small_seconds += small_seconds
+            if reason:
+                self.stats.escalations += 1
+                self.stats.large_seconds += large_seconds
+                self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+
+    async def stream(self, messages, tool_specs=None, system_prompt=None, **kwargs: Any) -> AsyncIterable[StreamEvent]:
+        started = time.perf_counter()
+        events = []
+        text = []
+        tool_calls = []
+        reason = None
+        try:
+            async for event in self.small.stream(messages, tool_specs, system_prompt, **kwargs):
+                events.append(event)
+                tool_use = event.get("contentBlockStart", {}).get("start", {}).get("toolUse")
+                if tool_use is not None:
+                    tool_calls.append([tool_use.get("name"), ""])
+                delta = event.get("contentBlockDelta", {}).get("delta", {})
+                if "text" in delta:
+                    text.append(delta["text"])
+                if "toolUse" in delta and tool_calls:
+                    tool_calls[-1][1] += delta["toolUse"].get("input", "")
+            reason = self.escalation_reason("".join(text), tool_calls, tool_specs)
+        except Exception as e:
+            logging.warning(f"Cascade {self.role}: small model failed {e}")
+            reason = "small_model_error"
+        small_seconds = time.perf_counter() - started
+
+        if reason is None:
+            self._record(small_seconds)
+            for event in events:
+                yield event
+            return
+
+        logging.info(f"Cascade {self.role}: escalating to large model ({reason})")
+        started = time.perf_counter()
+        async for event in self.large.stream(messages, tool_specs, system_prompt, **kwargs):
+            yield event
+        self._record(small_seconds, time.perf_counter() - started, reason)
+
+    async def structured_output(self, output_model, prompt, system_prompt=None, **kwargs: Any):
+        started = time.perf_counter()
+        try:
+            events = [event async for event in self.small.structured_output(output_model, prompt, system_prompt, **kwargs)]
+            self._record(time.perf_counter() - started)
+            for event in events:
+                yield event
+            return
+        except Exception as e:
+            logging.info(f"Cascade {self.role}: structured output escalated ({e})")
+        small_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        async for event in self.large.structured_output(output_model, prompt, system_prompt, **kwargs):
+            yield event
+        self._record(small_seconds, time.perf_counter() - started, "invalid_structured_output")
+
+    def report(self):
+        with self.lock:
+            return {"role": self.role, **self.stats.snapshot()}
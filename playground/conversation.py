@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+from typing import Any, List, Optional
+
+from strands import Agent
+from strands.agent.conversation_manager import ConversationManager
+from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent
+from strands.types.content import Message
+from strands.types.exceptions import ContextWindowOverflowException
+
+logging.basicConfig(level=logging.INFO)
+
+SUMMARY_PREFIX = "[Conversation summary]"
+# Rough size of an image block once encoded for the model
+IMAGE_TOKENS = 1000
+# Per block cap when rendering folded turns for the summarizer
+MAX_BLOCK_CHARS = 2000
+
+SUMMARY_PROMPT = """
+You maintain the running summary of a browser automation session.
+You receive the previous summary and the turns which are being removed from the history.
+Return the updated summary as short bullet points: the goal, steps executed with their results,
+observer verdicts still relevant, selectors found, and open problems.
+Drop raw HTML, screenshots and anything no longer needed. Do not add commentary.
+"""
+
+
+def estimate_tokens(message: Message) -> int:
+    tokens = 4
+    for block in message.get("content", []):
+        if "text" in block:
+            tokens += len(block["text"]) // 4
+        elif "image" in block:
+            tokens += IMAGE_TOKENS
+        else:
+            tokens += len(json.dumps(block, default=str)) // 4
+    return tokens
+
+
+def render_block(block: dict) -> str:
+    if "text" in block:
+        return block["text"][:MAX_BLOCK_CHARS]
+    if "toolUse" in block:
+        return f"[tool call {block['toolUse']['name']}] {json.dumps(block['toolUse'].get('input'), default=str)[:MAX_BLOCK_CHARS]}"
+    if "toolResult" in block:
+        content = " ".join(render_block(part) for part in block["toolResult"].get("content", []))
+        return f"[tool result {block['toolResult'].get('status', '')}] {content[:MAX_BLOCK_CHARS]}"
+    if "image" in block:
+        return "[image]"
+    return json.dumps(block, default=str)[:MAX_BLOCK_CHARS]
+
+
+class TokenBudgetConversationManager(ConversationManager, HookProvider):
+    """
+    Keeps the history of an agent under a token budget.
+
+    The latest `preserve_recent_messages` messages stay verbatim. Older turns
+    are folded into a rolling summary, which is updated incrementally from the
+    previous summary and only the newly removed turns. The system prompt is not
+    part of the messages and is never touched.
+
+    Register the manager both as conversation_manager and in hooks, so the
+    budget is also enforced between the model calls of one long invocation.
+    The summary call runs in a worker thread there, and `hooks` are passed to
+    the summarizer agent so it waits for the same rate limiter as the agent:
+
+        rate_limit = RateLimitHook()
+        manager = TokenBudgetConversationManager(model=llama_model, hooks=[rate_limit])
+        Agent(..., conversation_manager=manager, hooks=[rate_limit, manager])
+    """
+
+    def __init__(self, model=None, max_tokens: int = 16000, preserve_recent_messages: int = 6,
+                 hooks: Optional[List[HookProvider]] = None):
+        super().__init__()
+        self.model = model
+        self.hooks = list(hooks or [])
+        self.max_tokens = max_tokens
+        self.preserve_recent_messages = preserve_recent_messages
+        self.summary = ""
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        registry.add_callback(event_type=BeforeModelCallEvent, callback=self.before_model_call)
+
+    async def before_model_call(self, event: BeforeModelCallEvent) -> None:
+        # The agent waits for the hook, folding may call the summarizer model without blocking the event loop
+        await asyncio.to_thread(self.apply_management, event.agent)
+
+    def get_state(self) -> dict[str, Any]:
+        return {"summary": self.summary, **super().get_state()}
+
+    def restore_from_session(self, state: dict[str, Any]) -> Optional[List[Message]]:
+        super().restore_from_session(state)
+        self.summary = state.get("summary", "")
+        return None
+
+    def apply_management(self, agent: Agent, **kwargs: Any) -> None:
+        tokens = sum(estimate_tokens(message) for message in agent.messages)
+        if tokens <= self.max_tokens:
+            return
+        logging.info(f"History of {agent.name} at ~{tokens} tokens, folding older turns into the summary")
+        try:
+            self.fold(agent, self.preserve_recent_messages)
+        except ContextWindowOverflowException as e:
+            # The preserved turns alone exceed the budget, reduce_context handles a real overflow
+            logging.info(f"History of {agent.name} not folded: {e}")
+
+    def reduce_context(self, agent: Agent, e: Optional[Exception] = None, **kwargs: Any) -> None:
+        self.fold(agent, max(2, self.preserve_recent_messages // 2), e)
+
+    def _split_point(self, messages: List[Message], preserve: int) -> int:
+        split = len(messages) - preserve
+        # Never separate a toolResult from the toolUse it answers
+        while 0 < split < len(messages) and any("toolResult" in block for block in messages[split]["content"]):
+            split += 1
+        return split if split < len(messages) else 0
+
+    def fold(self, agent: Agent, preserve: int, e: Optional[Exception] = None) -> None:
+        messages = agent.messages
+        split = self._split_point(messages, preserve)
+        if split <= 0:
+            raise ContextWindowOverflowException("Cannot fold history: nothing older than the preserved turns") from e
+
+        folded = messages[:split]
+        transcript = "\n".join(
+            f"{message['role']}: {render_block(block)}"
+            for message in folded for block in message["content"]
+            if not block.get("text", "").startswith(SUMMARY_PREFIX)
+        )
+        if not transcript:
+            raise ContextWindowOverflowException("Cannot fold history: only the summary is older than the preserved turns") from e
+        self.summary = self._summarize(transcript)
+        self.removed_message_count += len(folded)
+
+        remaining = messages[split:]
+        summary_block = {"text": f"{SUMMARY_PREFIX}\n{self.summary}"}
+        if remaining[0]["role"] == "user":
+            # Keep roles alternating, the summary becomes part of the first preserved user message
+            remaining[0] = {**remaining[0], "content": [summary_block] + list(remaining[0]["content"])}
+        else:
+            remaining.insert(0, {"role": "user", "content": [summary_block]})
+        messages[:] = remaining
+
+    def _summarize(self, transcript: str) -> str:
+        prompt = f"Previous summary:\n{self.summary or '(none)'}\n\nTurns being removed:\n{transcript}"
+        if self.model is not None:
+            try:
+                summarizer = Agent(name="Summarizer Agent", system_prompt=SUMMARY_PROMPT, model=self.model,
+                                   callback_handler=None, hooks=self.hooks)
+                return str(summarizer(prompt)).strip()
+            except Exception as e:
+                logging.warning(f"Summarization failed, keeping a truncated transcript: {e}")
+        # Without a model keep the tail of the folded turns, bounded like a summary would be
+        return (self.summary + "\n" + transcript)[-4 * MAX_BLOCK_CHARS:]
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent, BeforeToolCallEvent, AfterToolCallEvent
+
+logging.basicConfig(level=logging.INFO)
+
+
+class BudgetExceededError(Exception):
+    """Raised when a goal keeps calling the model after it was asked to stop."""
+
+
+@dataclass
+class GoalBudget:
+    # Calls of the top level agent only, the planner/observer/executor agents it calls are not counted
+    max_model_calls: int = 150
+    max_tool_calls: int = 60
+    # planner/observer rounds without a successful execution
+    max_no_progress: int = 4
+    # model calls allowed after the stop was signalled, to let the orchestrator summarise
+    grace_model_calls: int = 2
+
+
+@dataclass
+class GoalState:
+    model_calls: int = 0
+    tool_calls: int = 0
+    no_progress: int = 0
+    last_plan: str = ""
+    seen_states: set = field(default_factory=set)
+    stop_reason: Optional[str] = None
+    model_calls_at_stop: int = 0
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+class LoopGuard(HookProvider):
+    """
+    Tracks the plan/observe/execute loop of every session and stops it when
+    the same (plan, observation, page fingerprint) state repeats, when no step
+    gets executed for too many rounds or when the goal budget is spent.
+
+    Agents must carry the session in their state (Agent(state={"session_id": ...}))
+    so model calls can be attributed to the goal. The budget counts the calls of
+    the top_level agent, the one driving the loop, by name. Tool calls of the
+    sub-agents are cancelled once the goal is stopped.
+    """
+
+    def __init__(self, budget: GoalBudget = None, fingerprint_fn: Callable[[str], Optional[str]] = None,
+                 top_level: str = "Orchestrator Agent"):
+        self.budget = budget or GoalBudget()
+        self.fingerprint_fn = fingerprint_fn
+        self.top_level = top_level
+        self.goals = {}
+        self.lock = threading.Lock()
+
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(event_type=BeforeModelCallEvent, callback=self.before_model_call)
+        registry.add_callback(event_type=BeforeToolCallEvent, callback=self.before_tool_call)
+        registry.add_callback(event_type=AfterToolCallEvent, callback=self.after_tool_call)
+
+    def start_goal(self, session_id: str) -> None:
+        with self.lock:
+            self.goals[session_id] = GoalState()
+
+    def _goal(self, session_id: str) -> GoalState:
+        with self.lock:
+            return self.goals.setdefault(session_id, GoalState())
+
+    # Callers hold the lock
+    def _stop(self, goal: GoalState, reason: str) -> None:
+        if goal.stop_reason is None:
+            logging.warning(f"Loop guard stopping goal: {reason}")
+            goal.stop_reason = reason
+            goal.model_calls_at_stop = goal.model_calls
+
+    def stop_reason(self, session_id: str) -> Optional[str]:
+        return self._goal(session_id).stop_reason
+
+    def before_model_call(self, event: BeforeModelCallEvent) -> None:
+        session_id = event.agent.state.get("session_id")
+        if not session_id or event.agent.name != self.top_level:
+            return
+        with self.lock:
+            goal = self.goals.setdefault(session_id, GoalState())
+            goal.model_calls += 1
+            if goal.model_calls > self.budget.max_model_calls:
+                self._stop(goal, f"model call budget of {self.budget.max_model_calls} exhausted")
+            stop_reason = goal.stop_reason
+            over_grace = goal.model_calls - goal.model_calls_at_stop > self.budget.grace_model_calls
+        if stop_reason and over_grace:
+            raise BudgetExceededError(stop_reason)
+
+    def before_tool_call(self, event: BeforeToolCallEvent) -> None:
+        session_id = event.invocation_state.get("session_id")
+        if not session_id:
+            return
+        with self.lock:
+            goal = self.goals.setdefault(session_id, GoalState())
+            if event.agent.name == self.top_level:
+                goal.tool_calls += 1
+                if goal.tool_calls > self.budget.max_tool_calls:
+                    self._stop(goal, f"tool call budget of {self.budget.max_tool_calls} exhausted")
+            stop_reason = goal.stop_reason
+        if stop_reason:
+            event.cancel_tool = (f"LOOP_GUARD: {stop_reason}. Do not call further tools, "
+                                 "explain the blocking reason to the user and terminate the loop.")
+
+    async def after_tool_call(self, event: AfterToolCallEvent) -> None:
+        session_id = event.invocation_state.get("session_id")
+        tool_name = event.tool_use["name"]
+        if not session_id or event.exception or tool_name not in ("planner", "observer", "executor"):
+            return
+        text = " ".join(block.get("text", "") for block in event.result.get("content", []))
+        # The page fingerprint may need a screenshot, keep it off the agent's event loop
+        await asyncio.to_thread(self.record, session_id, tool_name, text)
+
+    def record(self, session_id: str, tool_name: str, result: str) -> None:
+        """Record a planner, observer or executor result of the supervisor loop."""
+        fingerprint = self.fingerprint_fn(session_id) if tool_name == "observer" and self.fingerprint_fn else ""
+        with self.lock:
+            goal = self.goals.setdefault(session_id, GoalState())
+            if tool_name == "planner":
+                goal.last_plan = _normalize(result)
+            elif tool_name == "observer":
+                goal.no_progress += 1
+                state = hashlib.sha1(f"{goal.last_plan}|{_normalize(result)}|{fingerprint}".encode("utf-8")).hexdigest()
+                if state in goal.seen_states:
+                    self._stop(goal, "the same plan and observation repeated on an unchanged page")
+                goal.seen_states.add(state)
+                if goal.no_progress > self.budget.max_no_progress:
+                    self._stop(goal, f"no step executed for {goal.no_progress} planning rounds")
+            elif tool_name == "executor" and "success" in result.lower():
+                goal.no_progress = 0
@@ -0,0 +1,39 @@
+import hashlib
+import io
+import re
+
+from PIL import Image
+
+SCRIPT_OR_STYLE = re.compile(r"<(script|style|noscript)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+WHITESPACE = re.compile(r"\s+")
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image. Visually identical screenshots produce the same
+    (or a very close) hash even when the encoded bytes differ.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+        pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def dom_hash(html: str) -> str:
+    # Scripts and styles change between loads without changing what the user sees
+    normalized = WHITESPACE.sub(" ", SCRIPT_OR_STYLE.sub("", html))
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def page_fingerprint(url: str, html: str, screenshot: bytes) -> str:
+    return f"{url}|{dom_hash(html)}|{dhash(screenshot):016x}"
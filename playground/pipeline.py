@@ -0,0 +1,225 @@
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent, BeforeToolCallEvent
+
+logging.basicConfig(level=logging.INFO)
+
+
+def parse_plan(plan: str) -> List[str]:
+    """Extract the ordered steps from the planner output, JSON first and numbered lines as fallback."""
+    match = re.search(r"\{.*\}", plan, re.DOTALL)
+    if match:
+        try:
+            steps = json.loads(match.group()).get("PLAN", [])
+            if isinstance(steps, dict):
+                steps = list(steps.values())
+            return [str(step).strip() for step in steps if str(step).strip()]
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    return [line.split(".", 1)[1].strip() for line in plan.splitlines() if re.match(r"^\s*\d+\.", line)]
+
+
+def _same_step(a: str, b: str) -> bool:
+    return " ".join(a.lower().split()) == " ".join(b.lower().split())
+
+
+# Steps which only read the page, the state after them is the state before them
+READ_ONLY_STEP = re.compile(
+    r"^\W*(\d+\s*[.)-]\s*)?(verify|check|confirm|ensure|read|extract|get|find|locate|look|observe|inspect|"
+    r"identify|wait|take\s+(a\s+)?screenshot|capture)\b", re.IGNORECASE)
+
+
+def predict_state(step: str, fingerprint: Optional[str]) -> Optional[str]:
+    """
+    Predicted page fingerprint after the step runs, None when it can't be predicted.
+
+    Only read-only steps are predicted, they leave the page as it is. Any other
+    step navigates, types or clicks, a verdict made on the page before it says
+    nothing about the page after it.
+    """
+    return fingerprint if fingerprint and READ_ONLY_STEP.match(step) else None
+
+
+class SpeculationCancelled(Exception):
+    pass
+
+
+class Cancellation(HookProvider):
+    """
+    Stops an observer agent which is already running: once cancelled, its next
+    model or tool call raises SpeculationCancelled.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self) -> None:
+        self.event.set()
+
+    def is_cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(event_type=BeforeModelCallEvent, callback=self.check)
+        registry.add_callback(event_type=BeforeToolCallEvent, callback=self.check)
+
+    def check(self, event) -> None:
+        if self.event.is_set():
+            raise SpeculationCancelled()
+
+
+class Speculation:
+    """Observer verdict for the next step, computed while the current step executes."""
+
+    def __init__(self, step: str, future, cancellation: Cancellation, predicted: str):
+        self.step = step
+        self.future = future
+        self.cancellation = cancellation
+        # Page fingerprint the current step is expected to leave behind
+        self.predicted = predicted
+
+    def cancel(self) -> None:
+        # future.cancel() only helps while it is queued, a running observer stops at its next call
+        self.future.cancel()
+        self.cancellation.cancel()
+
+
+class PipelinedOrchestrator:
+    """
+    Deterministic plan -> observe -> execute loop with overlapping stages.
+
+    - The page snapshot is prefetched while the planner model is thinking.
+    - While step N executes, step N+1 is validated speculatively against the
+      state predict_fn expects step N to leave behind. Steps whose outcome
+      can't be predicted (navigation, clicks, typing) are not speculated past,
+      a verdict made on the page before them would almost always be thrown
+      away. The verdict is used only if the next plan still starts with that
+      step and both the snapshot the observer looked at and the state after
+      step N match the prediction, otherwise it is discarded and the step is
+      observed again.
+
+    observe_fn(step, executed_steps, session_id, fingerprint, cancellation)
+    returns the verdict and the fingerprint of the snapshot it was made on,
+    None when the page changed while the observer was looking at it.
+
+    Model calls only exceed those of the sequential loop by the discarded
+    speculations, stats() reports the hit rate.
+    """
+
+    def __init__(self, plan_fn: Callable, observe_fn: Callable, execute_fn: Callable,
+                 prefetch_fn: Callable[[str], Optional[str]], max_steps: int = 30, loop_guard=None,
+                 predict_fn: Callable[[str, Optional[str]], Optional[str]] = predict_state):
+        self.plan_fn = plan_fn
+        self.observe_fn = observe_fn
+        self.execute_fn = execute_fn
+        self.prefetch_fn = prefetch_fn
+        self.predict_fn = predict_fn
+        self.max_steps = max_steps
+        self.loop_guard = loop_guard
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pipeline")
+        self.lock = threading.Lock()
+        self.speculation_hits = 0
+        self.speculation_discards = 0
+        self.speculation_skips = 0
+
+    def _count(self, counter: str) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self.lock:
+            speculated = self.speculation_hits + self.speculation_discards
+            return {"speculation_hits": self.speculation_hits, "speculation_discards": self.speculation_discards,
+                    "speculation_skips": self.speculation_skips,
+                    "speculation_hit_rate": self.speculation_hits / speculated if speculated else 0.0}
+
+    def _speculate(self, step: str, executed_steps: str, session_id: str, cancellation: Cancellation):
+        if cancellation.is_cancelled():
+            return None, None
+        try:
+            verdict, seen_fingerprint = self.observe_fn(step, executed_steps, session_id, None, cancellation)
+        except SpeculationCancelled:
+            logging.info(f"Pipeline: speculation for '{step}' cancelled")
+            return None, None
+        return str(verdict), seen_fingerprint
+
+    def _use_speculation(self, speculation: Optional[Speculation], step: str, fingerprint: Optional[str]):
+        if speculation is None:
+            return None
+        if not _same_step(speculation.step, step):
+            speculation.cancel()
+            self._count("speculation_discards")
+            logging.info(f"Pipeline: discarding speculation for '{speculation.step}', plan changed")
+            return None
+        verdict, seen_fingerprint = speculation.future.result()
+        if verdict is None or seen_fingerprint != speculation.predicted or fingerprint != speculation.predicted:
+            self._count("speculation_discards")
+            logging.info(f"Pipeline: discarding speculation for '{step}', page state diverged from the prediction")
+            return None
+        self._count("speculation_hits")
+        logging.info(f"Pipeline: using speculative verdict for '{step}'")
+        return verdict
+
+    def run(self, goal: str, session_id: str) -> str:
+        executed: List[str] = []
+        observer_feedback = ""
+        execution_result = ""
+        speculation = None
+
+        for _ in range(self.max_steps):
+            if self.loop_guard and self.loop_guard.stop_reason(session_id):
+                break
+            started = time.perf_counter()
+            executed_steps = "; ".join(executed)
+            prefetch = self.pool.submit(self.prefetch_fn, session_id)
+            plan = str(self.plan_fn(goal, f"Executed steps: {executed_steps or 'none'}",
+                                    observer_feedback, execution_result, session_id))
+            steps = [step for step in parse_plan(plan) if not any(_same_step(step, done) for done in executed)]
+            if not steps:
+                return f"Goal completed. Executed steps: {executed_steps}"
+            if self.loop_guard:
+                self.loop_guard.record(session_id, "planner", plan)
+
+            step = steps[0]
+            fingerprint = prefetch.result()
+            verdict = self._use_speculation(speculation, step, fingerprint)
+            speculation = None
+            if verdict is None:
+                verdict, _ = self.observe_fn(step, executed_steps, session_id, fingerprint)
+                verdict = str(verdict)
+            if self.loop_guard:
+                self.loop_guard.record(session_id, "observer", verdict)
+            if "APPROVED" not in verdict or "REJECTED" in verdict:
+                observer_feedback = verdict
+                continue
+
+            predicted = self.predict_fn(step, fingerprint) if len(steps) > 1 else None
+            if predicted:
+                cancellation = Cancellation()
+                speculation = Speculation(steps[1], self.pool.submit(
+                    self._speculate, steps[1], "; ".join(executed + [step]), session_id, cancellation),
+                    cancellation, predicted)
+            elif len(steps) > 1:
+                self._count("speculation_skips")
+            execution_result = str(self.execute_fn(len(executed) + 1, step, session_id))
+            observer_feedback = ""
+            if self.loop_guard:
+                self.loop_guard.record(session_id, "executor", execution_result)
+            if "failure" in execution_result.lower():
+                logging.info(f"Pipeline: step '{step}' failed, replanning")
+            else:
+                executed.append(step)
+            logging.info(f"Pipeline: step '{step}' took {time.perf_counter() - started:.2f}s "
+                         f"(speculation {self.stats()})")
+
+        if speculation:
+            speculation.cancel()
+        reason = self.loop_guard.stop_reason(session_id) if self.loop_guard else None
+        reason = reason or f"no completion after {self.max_steps} iterations"
+        return f"Stopped: {reason}. Executed steps: {'; '.join(executed)}"
@@ -1,9 +1,11 @@
 import logging
 
+# Run from the repository root: python -m playground.playground
+
 from strands.models.llamacpp import LlamaCppModel
 
-from rate_limit_hook import RateLimitHook
-from tool_output_reduction import OutputLimitHook
+from playground.rate_limit_hook import RateLimitHook
+from playground.tool_output_reduction import OutputLimitHook
 
 from strands import Agent
 from strands.tools import tool
@@ -1,24 +1,48 @@
+import asyncio
 import json
 import logging
-from typing import Union, Optional, Dict, Any
+import os
+import threading
+import time
+from typing import Union, Optional, Dict, Any, List, Literal
+
+# Run from the repository root: python -m playground.playground_plan_observe_execute
+# Helpers shared with the supervisor app (artifacts, page index, readiness, streaming, telemetry) are root modules,
+# the playground's own modules are imported through the playground package
 
 from pydantic import BaseModel, Field
 from strands.models.llamacpp import LlamaCppModel
 from strands_tools.browser import LocalChromiumBrowser
 from strands_tools.browser.models import ListLocalSessionsAction, GetHtmlAction, ScreenshotAction, BrowserInput, \
-    NavigateAction, InitSessionAction
+    NavigateAction, InitSessionAction, RefreshAction, BackAction, ForwardAction
 from strands_tools.python_repl import python_repl
 
-from playgorund.agents import PLANNER_PROMPT, OBSERVER_PROMPT, EXECUTION_PROMPT, SELECTOR_PROMPT
-from rate_limit_hook import RateLimitHook
-from tool_output_reduction import OutputLimitHook
+from playground.agents import PLANNER_PROMPT, OBSERVER_PROMPT, EXECUTION_PROMPT, SELECTOR_PROMPT
+from playground.rate_limit_hook import RateLimitHook
+from playground.step_classifier import classify_step, approved, rejected, ENVIRONMENT_STEP, STATE_ESTABLISHING
+from playground.page_fingerprint import dom_hash, page_fingerprint
+from playground.verdict_cache import VerdictCache
+from playground.pipeline import PipelinedOrchestrator, Cancellation
+from playground.cascade_model import CascadeModel, ROLE_POLICIES
+from playground.loop_guard import LoopGuard, GoalBudget, BudgetExceededError
+from playground.screenshots import screenshot_store, encode_image, VISION_MAX_SIDE
+from streaming import stream_chat
+from playground.conversation import TokenBudgetConversationManager
+from history_compactor import HistoryCompactor
+from artifacts import artifact_store, ARTIFACT_TOOLS, ARTIFACT_INLINE_CHARS
+from page_index import page_indexes
+from readiness import page_readiness
+from playground.prefetch import NavigationPrefetcher
+from playground.tool_output_reduction import OutputLimitHook
+from telemetry import telemetry
+from playground.visual_cache import visual_query_cache
 
 from strands import Agent, ToolContext
 from strands.tools import tool
 
 import gradio as gr
 
-from tools import query_image
+from playground.tools import query_image, query_image_batch, set_visual_model
 
 logging.basicConfig(level=logging.DEBUG)
 logging.getLogger("strands_tools.browser").setLevel(logging.DEBUG)
@@ -34,6 +58,30 @@ llama_model = LlamaCppModel(
     }
 )
 
+# Optional small model, when configured every role asks it first and escalates to llama_model on low confidence
+SMALL_MODEL_URL = os.getenv("SMALL_MODEL_URL")
+small_llama_model = LlamaCppModel(
+    base_url=SMALL_MODEL_URL,
+    model_id="default",
+    params={
+        "max_tokens": 4000,
+        "temperature": 0.2,
+        "repeat_penalty": 1.1,
+    }
+) if SMALL_MODEL_URL else None
+
+role_models = {
+    role: CascadeModel(small_llama_model, llama_model, role) if small_llama_model else llama_model
+    for role in ROLE_POLICIES
+}
+
+
+set_visual_model(role_models["visual"])
+
+
+def cascade_report():
+    return [model.report() for model in role_models.values() if isinstance(model, CascadeModel)]
+
 
 class TestBrowserInput(BaseModel):
     """Input model for browser actions."""
@@ -43,10 +91,43 @@ class TestBrowserInput(BaseModel):
         GetHtmlAction,
         ScreenshotAction,
     ] = Field(discriminator="type")
-    wait_time: Optional[int] = Field(default=2, description="Time to wait after action in seconds")
+
+class ScriptStep(BaseModel):
+    """One action of a run_script batch."""
+
+    type: Literal["navigate", "click", "type", "select", "press", "wait", "assert", "extract"]
+    selector: Optional[str] = Field(default=None, description="Target element, required except for navigate, press and wait")
+    url: Optional[str] = Field(default=None, description="URL for navigate")
+    text: Optional[str] = Field(default=None, description="Text for type, option label for select, expected text for assert")
+    key: Optional[str] = Field(default=None, description="Key for press, e.g. Enter")
+    timeout_ms: Optional[int] = Field(default=None, description="Wait time for wait without selector, element timeout otherwise. "
+                                                        "A wait without selector and timeout waits until the page is ready")
+
+
+# Snapshots older than this are taken again, pages may change without any action of the agent
+SNAPSHOT_TTL_SECONDS = float(os.getenv("SNAPSHOT_TTL_SECONDS", "5"))
+
+# Script steps after which the page may navigate or re-render
+SETTLING_STEPS = {"navigate", "click", "press"}
+MAX_EXTRACT_CHARS = 2000
+
 
 class TestBrowser(LocalChromiumBrowser):
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The playwright loop is driven with run_until_complete, only one thread may drive it at a time
+        self.loop_lock = threading.RLock()
+        # session_name -> url, html, screenshot and fingerprint of the page until the next mutation,
+        # read through fresh_snapshot which also drops it once it is old or the page navigated on its own
+        self.snapshots = {}
+        # Set to a NavigationPrefetcher to reuse tabs warmed from the plan on navigate
+        self.prefetcher = None
+
+    def _execute_async(self, action_coro) -> Any:
+        with self.loop_lock, telemetry.span("browser_operation", operation=action_coro.__name__.removeprefix("_async_")):
+            return super()._execute_async(action_coro)
+
     @tool
     def observe_browser(self, browser_input: TestBrowserInput) -> Dict[str, Any]:
         """
@@ -72,22 +153,348 @@ class TestBrowser(LocalChromiumBrowser):
             return {"status": "error", "content": [{"text": "Error: No active page for session"}]}
 
         try:
-            if not action.selector:
+            snapshot = self.fresh_snapshot(action.session_name)
+            if not action.selector and snapshot:
+                result = snapshot["html"]
+            elif not action.selector:
                 result = await page.content()
             else:
-                await page.wait_for_selector(action.selector, timeout=5000)
+                await page.wait_for_selector(action.selector, timeout=page_readiness.timeout_ms)
                 result = await page.inner_html(action.selector)
+            if len(result) > ARTIFACT_INLINE_CHARS:
+                # Whole pages go to the artifact store, the agent greps or slices them by handle
+                if snapshot and not action.selector:
+                    handle = self.html_artifact(action.session_name)
+                else:
+                    handle = artifact_store.put(action.session_name, result, "html")
+                result = artifact_store.describe(handle)
             return {"status": "success", "content": [{"text": result}]}
         except Exception as e:
             logging.debug("exception=<%s> | get HTML action failed", str(e))
             return {"status": "error", "content": [{"text": f"Error: {str(e)}"}]}
 
+    @tool
+    def capture_screenshot(self, session_name: str, selector: str = None, clip: Dict[str, int] = None,
+                           format: str = "jpeg", quality: int = 70, max_side: int = VISION_MAX_SIDE) -> Dict[str, Any]:
+        """
+        Capture a screenshot into memory and return a handle usable as image_path of query_image.
+
+        Args:
+            session_name: Browser session to capture.
+            selector: Optional selector, only this element is captured.
+            clip: Optional region {"x", "y", "width", "height"} in CSS pixels.
+            format: jpeg, webp or png.
+            quality: Encoding quality for jpeg and webp (1-100).
+            max_side: The image is downscaled so its longest side is at most this many pixels.
+
+        Returns:
+            Dict containing the screenshot handle."""
+        error_response = self.validate_session(session_name)
+        if error_response:
+            return error_response
+        if format not in ("jpeg", "webp", "png"):
+            return {"status": "error", "content": [{"text": f"Error: Unsupported format {format}"}]}
+        return self._execute_async(self._async_capture_screenshot(session_name, selector, clip, format, quality, max_side))
+
+    async def _async_capture_screenshot(self, session_name, selector, clip, format, quality, max_side) -> Dict[str, Any]:
+        page = self.get_session_page(session_name)
+        if not page:
+            return {"status": "error", "content": [{"text": "Error: No active page for session"}]}
+        try:
+            snapshot = self.fresh_snapshot(session_name)
+            if selector:
+                raw = await page.locator(selector).first.screenshot(type="png", timeout=page_readiness.timeout_ms)
+            elif clip:
+                raw = await page.screenshot(type="png", clip=clip)
+            elif snapshot:
+                raw = snapshot["screenshot"]
+            else:
+                raw = await page.screenshot(type="png")
+            html = snapshot["html"] if snapshot else await page.content()
+            image_bytes, (width, height) = encode_image(raw, format, quality, max_side)
+            handle = screenshot_store.put(session_name, image_bytes, format, width, height,
+                                          page=f"{page.url}|{dom_hash(html)}")
+            return {"status": "success", "content": [{"text": f"Screenshot handle: {handle} "
+                                                              f"({width}x{height} {format}, {len(image_bytes)} bytes)"}]}
+        except Exception as e:
+            logging.debug("exception=<%s> | capture screenshot failed", str(e))
+            return {"status": "error", "content": [{"text": f"Error: {str(e)}"}]}
+
+    async def _async_screenshot(self, action: ScreenshotAction) -> Dict[str, Any]:
+        """Serve the screenshot from the prefetched snapshot when the page has not changed since."""
+        snapshot = self.fresh_snapshot(action.session_name)
+        if not snapshot or action.path and os.path.isabs(action.path):
+            return await super()._async_screenshot(action)
+        screenshots_dir = os.getenv("STRANDS_BROWSER_SCREENSHOTS_DIR", "screenshots")
+        os.makedirs(screenshots_dir, exist_ok=True)
+        path = os.path.join(screenshots_dir, action.path or f"screenshot_{int(time.time())}.png")
+        with open(path, "wb") as f:
+            f.write(snapshot["screenshot"])
+        return {"status": "success", "content": [{"text": f"Screenshot saved as {path}"}]}
+
+    def prefetch_snapshot(self, session_name: str) -> Optional[Dict[str, Any]]:
+        """Capture html and screenshot of the active page so later observations don't wait for them."""
+        if self.validate_session(session_name):
+            return None
+        with self.loop_lock:
+            snapshot = self._execute_async(self._async_snapshot(session_name))
+            if snapshot:
+                self.snapshots[session_name] = snapshot
+        return snapshot
+
+    async def _async_snapshot(self, session_name: str) -> Optional[Dict[str, Any]]:
+        page = self.get_session_page(session_name)
+        if not page:
+            return None
+        try:
+            html = await page.content()
+            screenshot = await page.screenshot(type="png")
+            return {"url": page.url, "html": html, "screenshot": screenshot,
+                    "fingerprint": page_fingerprint(page.url, html, screenshot), "taken": time.monotonic()}
+        except Exception as e:
+            logging.debug("exception=<%s> | page snapshot failed", str(e))
+            return None
+
+    async def _async_navigate(self, action: NavigateAction) -> Dict[str, Any]:
+        """Navigate and return once the page is usable, instead of waiting for networkidle."""
+        error_response = self.validate_session(action.session_name)
+        if error_response:
+            return error_response
+
+        page = self.get_session_page(action.session_name)
+        if not page:
+            return {"status": "error", "content": [{"text": "Error: No active page for session"}]}
+
+        try:
+            warm_page = await self.prefetcher.claim(action.session_name, action.url) if self.prefetcher else None
+            if warm_page:
+                ready = await page_readiness.wait_ready(warm_page, f"navigate {action.url} (prefetched)")
+                return {"status": "success", "content": [{"text": f"Navigated to {action.url} "
+                                                                  f"(prefetched, page ready after {ready['waited']:.2f}s)"}]}
+            page_readiness.track(page)
+            await page.goto(action.url, wait_until="domcontentloaded")
+            ready = await page_readiness.wait_ready(page, f"navigate {action.url}")
+            return {"status": "success", "content": [{"text": f"Navigated to {action.url} "
+                                                              f"(page ready after {ready['waited']:.2f}s)"}]}
+        except Exception as e:
+            logging.debug("exception=<%s> | navigate action failed", str(e))
+            return {"status": "error", "content": [{"text": f"Error: {str(e)}"}]}
+
+    async def _async_refresh(self, action: RefreshAction) -> Dict[str, Any]:
+        return await self._async_history_step(action, "refresh", lambda page: page.reload(wait_until="domcontentloaded"),
+                                              "Page refreshed")
+
+    async def _async_back(self, action: BackAction) -> Dict[str, Any]:
+        return await self._async_history_step(action, "back", lambda page: page.go_back(wait_until="domcontentloaded"),
+                                              "Navigated back")
+
+    async def _async_forward(self, action: ForwardAction) -> Dict[str, Any]:
+        return await self._async_history_step(action, "forward", lambda page: page.go_forward(wait_until="domcontentloaded"),
+                                              "Navigated forward")
+
+    async def _async_history_step(self, action, label: str, transition, message: str) -> Dict[str, Any]:
+        """Reload or move through the history and return once the page is usable, instead of waiting for networkidle."""
+        error_response = self.validate_session(action.session_name)
+        if error_response:
+            return error_response
+
+        page = self.get_session_page(action.session_name)
+        if not page:
+            return {"status": "error", "content": [{"text": "Error: No active page for session"}]}
+
+        try:
+            page_readiness.track(page)
+            await transition(page)
+            ready = await page_readiness.wait_ready(page, label)
+            return {"status": "success", "content": [{"text": f"{message} (page ready after {ready['waited']:.2f}s)"}]}
+        except Exception as e:
+            logging.debug("exception=<%s> | %s action failed", str(e), label)
+            return {"status": "error", "content": [{"text": f"Error: {str(e)}"}]}
+
+    async def _async_wait_ready(self, session_name: str, label: str) -> Optional[Dict[str, Any]]:
+        page = self.get_session_page(session_name)
+        if not page:
+            return None
+        return await page_readiness.wait_ready(page, label)
+
+    @tool
+    def run_script(self, session_name: str, steps: List[ScriptStep]) -> Dict[str, Any]:
+        """
+        Run several browser actions in order in one call, e.g. fill all fields of a form and submit it.
+        Stops at the first failing step. Returns the result and time of every step that ran.
+
+        Args:
+            session_name: Browser session to run the steps in.
+            steps: Ordered actions: navigate (url), click (selector), type (selector, text),
+                select (selector, text), press (key, optional selector), wait (selector or timeout_ms),
+                assert (selector visible, optional text contained) and extract (selector, returns its text).
+
+        Returns:
+            Dict with the per step results."""
+        error_response = self.validate_session(session_name)
+        if error_response:
+            return error_response
+        with self.loop_lock:
+            self.invalidate_snapshot(session_name)
+            return self._execute_async(self._async_run_script(session_name, steps))
+
+    async def _async_run_script(self, session_name: str, steps: List[ScriptStep]) -> Dict[str, Any]:
+        page = self.get_session_page(session_name)
+        if not page:
+            return {"status": "error", "content": [{"text": "Error: No active page for session"}]}
+        page_readiness.track(page)
+        results = []
+        started = time.monotonic()
+        for index, step in enumerate(steps):
+            step = ScriptStep.model_validate(step)
+            step_started = time.monotonic()
+            try:
+                result = await self._async_script_step(page, step)
+                if step.type in SETTLING_STEPS:
+                    await page_readiness.wait_ready(page, f"run_script {step.type}")
+                results.append({"step": index, "type": step.type, "status": "success", "result": result,
+                                "seconds": round(time.monotonic() - step_started, 3)})
+            except Exception as e:
+                logging.debug("exception=<%s> | run_script step %s failed", str(e), index)
+                results.append({"step": index, "type": step.type, "status": "error", "error": str(e),
+                                "seconds": round(time.monotonic() - step_started, 3)})
+                break
+        status = "success" if len(results) == len(steps) and all(r["status"] == "success" for r in results) else "error"
+        summary = {"status": status, "steps_run": len(results), "steps_skipped": len(steps) - len(results),
+                   "seconds": round(time.monotonic() - started, 3), "results": results}
+        return {"status": status, "content": [{"text": json.dumps(summary)}]}
+
+    async def _async_script_step(self, page, step: ScriptStep) -> Optional[str]:
+        timeout = step.timeout_ms or page_readiness.timeout_ms
+        if step.type == "navigate":
+            await page.goto(step.url, wait_until="domcontentloaded", timeout=timeout)
+            return page.url
+        if step.type == "press":
+            if step.selector:
+                await page.press(step.selector, step.key, timeout=timeout)
+            else:
+                await page.keyboard.press(step.key)
+            return None
+        if step.type == "wait" and not step.selector:
+            if step.timeout_ms:
+                await asyncio.sleep(step.timeout_ms / 1000)
+            else:
+                await page_readiness.wait_ready(page, "run_script wait")
+            return None
+        if not step.selector:
+            raise ValueError(f"{step.type} needs a selector")
+        if step.type == "click":
+            await page.click(step.selector, timeout=timeout)
+        elif step.type == "type":
+            await page.fill(step.selector, step.text or "", timeout=timeout)
+        elif step.type == "select":
+            return str(await page.select_option(step.selector, label=step.text, timeout=timeout))
+        elif step.type == "wait":
+            await page.wait_for_selector(step.selector, timeout=timeout)
+        elif step.type == "assert":
+            locator = page.locator(step.selector).first
+            await locator.wait_for(state="visible", timeout=timeout)
+            if step.text and step.text not in await locator.inner_text(timeout=timeout):
+                raise AssertionError(f"{step.selector} does not contain {step.text!r}")
+        elif step.type == "extract":
+            return (await page.locator(step.selector).first.inner_text(timeout=timeout))[:MAX_EXTRACT_CHARS]
+        return None
+
+    def html_artifact(self, session_name: str) -> Optional[str]:
+        """Artifact handle of the snapshot html, stored once per page version."""
+        snapshot = self.current_snapshot(session_name)
+        if not snapshot:
+            return None
+        if "html_handle" not in snapshot:
+            snapshot["html_handle"] = artifact_store.put(session_name, snapshot["html"], "html")
+        return snapshot["html_handle"]
+
+    def invalidate_snapshot(self, session_name: str) -> None:
+        self.snapshots.pop(session_name, None)
+        visual_query_cache.drop_session(session_name)
+
+    def fresh_snapshot(self, session_name: str) -> Optional[Dict[str, Any]]:
+        """
+        The snapshot of the session while it still describes the page, None otherwise.
+
+        Pages also change without a mutating action (timers, live updates, client
+        side redirects), the snapshot is dropped once it is older than
+        SNAPSHOT_TTL_SECONDS or the page url is no longer the one it was taken on.
+        """
+        snapshot = self.snapshots.get(session_name)
+        if not snapshot:
+            return None
+        page = self.get_session_page(session_name)
+        if not page or page.url != snapshot["url"] or time.monotonic() - snapshot["taken"] > SNAPSHOT_TTL_SECONDS:
+            self.invalidate_snapshot(session_name)
+            return None
+        return snapshot
+
+    def current_snapshot(self, session_name: str) -> Optional[Dict[str, Any]]:
+        return self.fresh_snapshot(session_name) or self.prefetch_snapshot(session_name)
+
+    def page_fingerprint(self, session_name: str) -> Optional[str]:
+        """Fingerprint of the active page (url, DOM hash, perceptual screenshot hash)."""
+        snapshot = self.current_snapshot(session_name)
+        return snapshot["fingerprint"] if snapshot else None
+
+
+# Browser actions which can change the page, the snapshot of the session is dropped before running them
+MUTATING_ACTIONS = [
+    "init_session", "navigate", "click", "type", "evaluate", "press_key", "refresh", "back", "forward",
+    "new_tab", "switch_tab", "close_tab", "set_cookies", "network_intercept", "execute_cdp", "close",
+]
+
+
+# Actions after which the page may still be loading or rendering, they return once it is ready again
+SETTLING_ACTIONS = ["click", "type", "evaluate", "press_key"]
+
+
+def _invalidates_snapshot(method_name: str):
+    base_method = getattr(LocalChromiumBrowser, method_name)
+
+    def method(self, action):
+        with self.loop_lock:
+            self.invalidate_snapshot(action.session_name)
+            result = base_method(self, action)
+            if method_name in SETTLING_ACTIONS and result.get("status") == "success":
+                ready = self._execute_async(self._async_wait_ready(action.session_name, method_name))
+                if ready:
+                    result["content"].append({"text": f"Page ready after {ready['waited']:.2f}s"})
+            return result
+    return method
+
+
+for _action in MUTATING_ACTIONS:
+    setattr(TestBrowser, _action, _invalidates_snapshot(_action))
 
 browser = TestBrowser()
 browser._default_launch_options = {"persistent_context": True}
+# Navigation targets of the latest plan load in background tabs, PREFETCH_MAX_TABS=0 turns it off
+PREFETCH_MAX_TABS = int(os.getenv("PREFETCH_MAX_TABS", "2"))
+browser.prefetcher = NavigationPrefetcher(browser, max_tabs=PREFETCH_MAX_TABS) if PREFETCH_MAX_TABS else None
+
+verdict_cache = VerdictCache()
+
+# Token budget of the message history of each agent, older turns are folded into a rolling summary
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "16000"))
+
+
+def budgeted_history(rate_limit: RateLimitHook, max_tokens: int = HISTORY_TOKEN_BUDGET) -> TokenBudgetConversationManager:
+    """History manager whose summarizer calls wait for the rate limiter of the agent."""
+    return TokenBudgetConversationManager(model=llama_model, max_tokens=max_tokens, hooks=[rate_limit])
+
+# Budgets of one goal, counted on the orchestrator agent
+loop_guard = LoopGuard(GoalBudget(
+    max_model_calls=int(os.getenv("GOAL_MAX_MODEL_CALLS", "150")),
+    max_tool_calls=int(os.getenv("GOAL_MAX_TOOL_CALLS", "60")),
+    max_no_progress=int(os.getenv("GOAL_MAX_NO_PROGRESS", "4")),
+), fingerprint_fn=browser.page_fingerprint, top_level="Orchestrator Agent")
+
+# Tool results seen this many assistant turns ago are stubbed out of the history
+history_compactor = HistoryCompactor(keep_turns=int(os.getenv("HISTORY_KEEP_TOOL_TURNS", "2")))
 
 
-import re
 
 
 @tool(context=True)
@@ -97,33 +504,39 @@ def grep_in_html_page(pattern, tool_context: ToolContext = None):
     along with surrounding context.
 
     This can be used to find elements or text inside an HTML page.
+    The page is not collapsed to a single line before matching, use \\s+ to match across line breaks.
     """
-    # make multi-line into single line
     session_id = tool_context.invocation_state["session_id"]
     #session_id = "asd1234567aa"
 
-    text = browser.observe_browser(browser_input=TestBrowserInput(action=GetHtmlAction(type="get_html", session_name=session_id)))
-    single_line = re.sub(r'\s+', ' ', text["content"][0]["text"])
-    logging.debug("single_line=%s", single_line)
-    results = []
-    after = 100
-    before = 1000
-    for match in re.finditer(pattern, single_line):
-        start, end = match.span()
-
-        context_start = max(0, start - before)
-        context_end = min(len(single_line), end + after)
-
-        results.append({
-            "match": match.group(),
-            "before": single_line[context_start:start],
-            "after": single_line[end:context_end],
-            "full": single_line[context_start:context_end],
-        })
+    # The page html is matched in place in the artifact store, only the context windows are copied
+    handle = browser.html_artifact(session_id)
+    if not handle:
+        return "Error: No active page for session"
+    results = artifact_store.grep(handle, pattern, before=1000, after=100, max_matches=50)
     logging.debug("results=%s", results)
     return results
 
 
+@tool(context=True)
+def search_page(query: str, k: int = 5, tool_context: ToolContext = None):
+    """
+    Search the text of the current page and return the k most relevant chunks.
+    Each chunk has the CSS selector of its element in "ref", usable as a selector for browser actions.
+
+    Args:
+        query: Words describing the text or element to find, e.g. "upload button" or "error message".
+        k: Number of chunks to return.
+    """
+    session_id = tool_context.invocation_state["session_id"]
+    snapshot = browser.current_snapshot(session_id)
+    if not snapshot:
+        return "Error: No active page for session"
+    # Only chunks changed since the last indexed page version are re-indexed
+    page_indexes.update(session_id, snapshot["html"], snapshot["fingerprint"])
+    return page_indexes.search(session_id, query, k)
+
+
 SYSTEM_PROMPT = """
 System Prompt: Tool-Orchestrating Supervisor
 You are a Supervisor agent responsible for achieving the user’s goal by orchestrating external tools.
@@ -213,19 +626,48 @@ PLAN:
 Each step must be independently executable.
 Do not include explanations outside the plan.
 """
-    logging.info(f"Planner: {goal} current_state_summary: {current_state_summary} observer_feedback: {observer_feedback}")
     session_id = tool_context.invocation_state["session_id"]
+    return plan_goal(goal, current_state_summary, observer_feedback, execution_result, session_id)
+
+
+def plan_goal(goal: str, current_state_summary: str, observer_feedback: str, execution_result: str, session_id: str):
+    logging.info(f"Planner: {goal} current_state_summary: {current_state_summary} observer_feedback: {observer_feedback}")
     agent = Agent(
         name="Planner Agent",
         system_prompt=PLANNER_PROMPT,
-        model=llama_model,
-        hooks=[RateLimitHook(), OutputLimitHook()]
+        model=role_models["planner"],
+        hooks=[RateLimitHook(), OutputLimitHook(), loop_guard, telemetry],
+        state={"session_id": session_id}
     )
     prompt = f"goal: {goal} current_state_summary: {current_state_summary} observer_feedback: {observer_feedback} execution_result:{execution_result} session_name:{session_id}"
     ans = agent(prompt, session_id=session_id)
+    if browser.prefetcher:
+        try:
+            browser.prefetcher.prefetch(session_id, str(ans))
+        except Exception as e:
+            logging.warning(f"Prefetch failed: {e}")
     return ans
 
 
+def observe_fast_path(step: str, session_id: str):
+    """
+    Rule based validation for steps which do not need the observer model.
+    Returns the verdict or None when the step must be observed on the page.
+    """
+    step_type = classify_step(step)
+    if step_type == ENVIRONMENT_STEP:
+        logging.info(f"Observer fast path: {step} approved as {step_type}")
+        return approved(step_type, "Environment steps create the session, no state check required")
+    if step_type == STATE_ESTABLISHING:
+        if browser.validate_session(session_id):
+            logging.info(f"Observer fast path: {step} rejected, no session {session_id}")
+            return rejected(step_type, f"No active browser session '{session_id}'",
+                            f"InitSession with session_name {session_id}")
+        logging.info(f"Observer fast path: {step} approved as {step_type}")
+        return approved(step_type, f"Browser session '{session_id}' exists, navigation attempt is allowed")
+    return None
+
+
 @tool(context=True)
 def observer(current_step_to_validate: str, executed_steps: str, tool_context: ToolContext = None):
     """You are the Observer tool in a multi-agent system.
@@ -259,18 +701,51 @@ Issues:
 Suggested additions or corrections:
 - <suggested step or constraint>
 """
-    logging.info(f"Observer: {current_step_to_validate} executed_steps: {executed_steps}")
     session_id = tool_context.invocation_state["session_id"]
+    return observe_step(current_step_to_validate, executed_steps, session_id)
+
+
+def observe_step(current_step_to_validate: str, executed_steps: str, session_id: str, fingerprint: str = None):
+    return observe_with_fingerprint(current_step_to_validate, executed_steps, session_id, fingerprint)[0]
+
+
+def observe_with_fingerprint(current_step_to_validate: str, executed_steps: str, session_id: str,
+                             fingerprint: str = None, cancellation: Cancellation = None):
+    """
+    Verdict for the step and the fingerprint of the snapshot it was made on, the
+    fingerprint is None when the page changed while the observer looked at it.
+    Fast path verdicts don't look at the page, the given fingerprint is passed
+    through and no snapshot is taken for them.
+    """
+    logging.info(f"Observer: {current_step_to_validate} executed_steps: {executed_steps}")
+    fast_verdict = observe_fast_path(current_step_to_validate, session_id)
+    if fast_verdict:
+        return fast_verdict, fingerprint
+    # Taken before the observer reads anything, the snapshot its tools serve has this fingerprint
+    fingerprint = fingerprint or browser.page_fingerprint(session_id)
+    cached_verdict = verdict_cache.get(session_id, current_step_to_validate, fingerprint)
+    if cached_verdict:
+        return cached_verdict, fingerprint
+    rate_limit = RateLimitHook()
+    history_manager = budgeted_history(rate_limit)
     agent = Agent(
-        name="Planner Agent",
+        name="Observer Agent",
         system_prompt=OBSERVER_PROMPT,
-        model=llama_model,
-        tools=[browser.observe_browser, query_image],
-        hooks=[RateLimitHook(), OutputLimitHook()]
+        model=role_models["observer"],
+        conversation_manager=history_manager,
+        tools=[browser.observe_browser, browser.capture_screenshot, query_image, query_image_batch, search_page] + ARTIFACT_TOOLS,
+        hooks=[rate_limit, OutputLimitHook(), loop_guard, history_compactor, history_manager, telemetry]
+              + ([cancellation] if cancellation else []),
+        state={"session_id": session_id}
     )
     prompt = f"current_step: {current_step_to_validate} executed_steps: {executed_steps} session-name:{session_id}"
     ans = agent(prompt, session_id=session_id)
-    return ans
+    # A mutation while the observer was reading mixes two page states, the verdict belongs to neither
+    if browser.page_fingerprint(session_id) != fingerprint:
+        logging.info(f"Observer: page changed while observing '{current_step_to_validate}'")
+        return ans, None
+    verdict_cache.put(session_id, current_step_to_validate, fingerprint, str(ans))
+    return ans, fingerprint
 
 
 @tool(context=True)
@@ -292,17 +767,30 @@ EXECUTION_RESULT:
 - result
 - status: success | failure
 """
-    logging.info(f"Executor: {step_id} step_description: {step_description}")
     session_id = tool_context.invocation_state["session_id"]
+    return execute_step(step_id, step_description, session_id)
+
+
+def execute_step(step_id, step_description, session_id: str):
+    logging.info(f"Executor: {step_id} step_description: {step_description}")
+    rate_limit = RateLimitHook()
+    history_manager = budgeted_history(rate_limit)
     agent = Agent(
         name="Execution Agent",
         system_prompt=EXECUTION_PROMPT,
-        model=llama_model,
-        tools=[browser.browser, selector],
-        hooks=[RateLimitHook(), OutputLimitHook()]
+        model=role_models["executor"],
+        conversation_manager=history_manager,
+        tools=[browser.browser, browser.run_script, selector] + ARTIFACT_TOOLS,
+        hooks=[rate_limit, OutputLimitHook(), loop_guard, history_compactor, history_manager, telemetry],
+        state={"session_id": session_id}
     )
     prompt = f"step_id: {step_id} step_description: {step_description} session-name:{session_id}"
-    ans = agent(prompt, session_id=session_id)
+    try:
+        ans = agent(prompt, session_id=session_id)
+    finally:
+        # Any executed step may navigate or mutate the page
+        verdict_cache.invalidate(session_id)
+        browser.invalidate_snapshot(session_id)
     return ans
 
 actions_string = (
@@ -330,12 +818,16 @@ EXECUTION_RESULT:
 """
     logging.info(f"Selector: Finding selector for step_description: {step_description}")
     session_id = tool_context.invocation_state["session_id"]
+    rate_limit = RateLimitHook()
+    history_manager = budgeted_history(rate_limit)
     agent = Agent(
         name="Selector Agent",
         system_prompt=SELECTOR_PROMPT,
-        model=llama_model,
-        tools=[query_image, grep_in_html_page],
-        hooks=[RateLimitHook(), OutputLimitHook()]
+        model=role_models["selector"],
+        conversation_manager=history_manager,
+        tools=[browser.capture_screenshot, query_image, query_image_batch, grep_in_html_page, search_page] + ARTIFACT_TOOLS,
+        hooks=[rate_limit, OutputLimitHook(), loop_guard, history_compactor, history_manager, telemetry],
+        state={"session_id": session_id}
     )
     prompt = f"step_description: {step_description} allowed-actions-for-step:{actions_string} session-name:{session_id}"
     ans = agent(prompt, session_id=session_id)
@@ -344,26 +836,82 @@ EXECUTION_RESULT:
 
 
 
+orchestrator_rate_limit = RateLimitHook()
+orchestrator_history = budgeted_history(orchestrator_rate_limit)
 agent = Agent(
     name="Orchestrator Agent",
     system_prompt=SYSTEM_PROMPT,
-    model=llama_model,
+    model=role_models["orchestrator"],
     tools=[planner, observer, executor],
-    hooks=[RateLimitHook(), OutputLimitHook()]
+    conversation_manager=orchestrator_history,
+    # Telemetry last, its model call spans start after the limiter and history trimming
+    hooks=[orchestrator_rate_limit, OutputLimitHook(), loop_guard, orchestrator_history, telemetry]
 )
 
 
+def prefetch_fingerprint(session_id: str):
+    snapshot = browser.prefetch_snapshot(session_id)
+    return snapshot["fingerprint"] if snapshot else None
+
+
+# "agent" lets the orchestrator model drive the loop, "pipelined" overlaps planning, observation and execution
+ORCHESTRATOR_MODE = os.getenv("ORCHESTRATOR_MODE", "agent")
+pipeline = PipelinedOrchestrator(plan_goal, observe_with_fingerprint, execute_step, prefetch_fingerprint, loop_guard=loop_guard)
+
+# A port of its own, the supervisor app serves on METRICS_PORT (9464); 0 turns the endpoint off
+METRICS_PORT = int(os.getenv("PLAYGROUND_METRICS_PORT", "9465"))
+telemetry.register_collector("cascade", lambda: {report["role"]: report for report in cascade_report()}, label="role")
+telemetry.register_collector("verdict_cache", verdict_cache.stats)
+telemetry.register_collector("pipeline", pipeline.stats)
+telemetry.register_collector("visual_cache", visual_query_cache.stats)
+telemetry.register_collector("readiness", page_readiness.stats)
+telemetry.register_collector("artifacts", artifact_store.stats)
+if browser.prefetcher:
+    telemetry.register_collector("prefetch", browser.prefetcher.stats)
+
+
 async def chat(message, _, request: gr.Request):
     try:
-        # Execute the agent
-        result = agent(message, session_id=request.session_hash)
-        return str(result)
+        loop_guard.start_goal(request.session_hash)
+        if browser.prefetcher:
+            # Tabs warmed for the previous goal's plan
+            browser.prefetcher.discard_session(request.session_hash)
+        if ORCHESTRATOR_MODE == "pipelined":
+            # The pipeline blocks on model calls and the browser, the Gradio event loop keeps serving meanwhile
+            yield await asyncio.to_thread(pipeline.run, message, request.session_hash)
+            return
+        # Stream the orchestrator text and planner/observer/executor progress as it happens
+        agent.state.set("session_id", request.session_hash)
+        events = agent.stream_async(message, invocation_state={"session_id": request.session_hash})
+        async for partial in stream_chat(events):
+            yield partial
+    except BudgetExceededError as e:
+        logging.warning(f"Goal stopped by loop guard: {e}")
+        yield f"Stopped: {e}. Please refine the goal or retry later."
     except Exception as e:
         logging.exception("Agent error")
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
+    finally:
+        logging.info(f"Time by span: {telemetry.summary(request.session_hash, top=5)}")
 
-# Launch Gradio
-gr.ChatInterface(chat).launch()
+
+def prewarm_browser() -> None:
+    """Start Playwright while Gradio starts, the first goal does not pay for it."""
+    started = time.monotonic()
+    try:
+        with browser.loop_lock:
+            browser._start()
+        logging.info(f"Browser prewarmed in {time.monotonic() - started:.2f}s")
+    except Exception:
+        logging.exception("Browser prewarm failed, starting on the first goal instead")
+
+
+if __name__ == "__main__":
+    threading.Thread(target=prewarm_browser, daemon=True, name="browser-prewarm").start()
+    if METRICS_PORT:
+        telemetry.serve(METRICS_PORT)
+    # Launch Gradio
+    gr.ChatInterface(chat).launch()
 
 #if __name__ == '__main__':
 
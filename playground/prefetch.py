@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+from urllib.parse import urlparse
+
+from playground.pipeline import parse_plan
+from readiness import page_readiness
+
+logging.basicConfig(level=logging.INFO)
+
+# Navigation steps with an explicit address, "Navigate to https://example.com/cart"
+NAVIGATION_STEP = re.compile(r"^\s*(?:navigate|go|open|visit|browse)\b", re.IGNORECASE)
+URL_PATTERN = re.compile(r"\bhttps?://[^\s\"'<>),]+", re.IGNORECASE)
+# Loading these is an action with side effects, never done ahead of the step
+UNSAFE_PATH = re.compile(r"log-?out|sign-?out|log-?off|delete|remove|unsubscribe|cancel|revoke|destroy", re.IGNORECASE)
+
+
+def navigation_targets(plan: str) -> List[str]:
+    """
+    URLs the plan will navigate to, in plan order. Only explicit http(s) URLs of
+    navigation steps count, URLs with a logout/delete-like path or query are skipped.
+    """
+    targets = []
+    for step in parse_plan(plan):
+        match = URL_PATTERN.search(step) if NAVIGATION_STEP.match(step) else None
+        if not match:
+            continue
+        url = match.group().rstrip(".")
+        parsed = urlparse(url)
+        if not parsed.hostname or UNSAFE_PATH.search(f"{parsed.path}?{parsed.query}"):
+            continue
+        if url not in targets:
+            targets.append(url)
+    return targets
+
+
+def url_key(url: str) -> str:
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    host = host[4:] if host.startswith("www.") else host
+    return f"{host}{parsed.path.rstrip('/')}{'?' + parsed.query if parsed.query else ''}"
+
+
+@dataclass
+class Prefetch:
+    url: str
+    page: object
+    task: asyncio.Future
+    started: float
+
+
+class NavigationPrefetcher:
+    """
+    Warms the navigation targets of the current plan in background tabs of the session context.
+
+    At most max_tabs tabs per session load ahead, for at most ttl_seconds, a
+    timer closes them when they were not used by then. The goto runs as a task
+    on the browser loop and progresses whenever the loop is driven by other
+    browser actions. When the step navigates to a warmed target, the tab
+    replaces the active page of the session. Tabs of the previous plan are
+    discarded when a plan or goal starts.
+    """
+
+    def __init__(self, browser, max_tabs: int = 2, ttl_seconds: float = 120):
+        self.browser = browser
+        self.max_tabs = max_tabs
+        self.ttl_seconds = ttl_seconds
+        self.prefetched = {}
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+
+    def prefetch(self, session_name: str, plan: str) -> List[str]:
+        """Start loading the plan's navigation targets, returns the URLs now loading."""
+        targets = navigation_targets(plan)
+        if self.browser.validate_session(session_name):
+            return []
+        with self.browser.loop_lock:
+            started = self.browser._execute_async(self._async_prefetch(session_name, targets))
+        if started:
+            timer = threading.Timer(self.ttl_seconds + 1, self.expire, args=(session_name,))
+            timer.daemon = True
+            timer.start()
+        return started
+
+    def expire(self, session_name: str) -> None:
+        """Close the session's tabs older than ttl_seconds, run by the timer started with them."""
+        if self.prefetched.get(session_name):
+            self.browser._execute_async(self._expire(self.prefetched[session_name]))
+
+    def discard_session(self, session_name: str) -> None:
+        """Close all warmed tabs of the session, e.g. when a new goal starts."""
+        if self.prefetched.get(session_name):
+            self.browser._execute_async(self.discard(session_name))
+
+    async def _async_prefetch(self, session_name: str, targets: List[str]) -> List[str]:
+        session = self.browser._sessions.get(session_name)
+        if not session or not session.context:
+            return []
+        entries = self.prefetched.setdefault(session_name, OrderedDict())
+        await self._expire(entries)
+        # Targets the new plan no longer visits would only hold a tab
+        wanted = {url_key(url) for url in targets}
+        for key in [key for key in entries if key not in wanted]:
+            await self._close(entries.pop(key))
+        active = session.get_active_page()
+        current = url_key(active.url) if active else None
+        started = []
+        for url in targets:
+            key = url_key(url)
+            if key == current or key in entries:
+                continue
+            if len(entries) >= self.max_tabs:
+                break
+            page = await session.context.new_page()
+            page_readiness.track(page)
+            task = asyncio.ensure_future(page.goto(url, wait_until="domcontentloaded"))
+            entries[key] = Prefetch(url, page, task, time.monotonic())
+            self.started += 1
+            started.append(url)
+        if started:
+            logging.info(f"Prefetching {started} for {session_name}")
+        return started
+
+    async def _expire(self, entries: OrderedDict) -> None:
+        for key in [k for k, entry in entries.items() if time.monotonic() - entry.started > self.ttl_seconds]:
+            await self._close(entries.pop(key))
+
+    async def _close(self, entry: Prefetch) -> None:
+        self.wasted += 1
+        entry.task.cancel()
+        try:
+            await entry.page.close()
+        except Exception as e:
+            logging.debug("exception=<%s> | closing prefetched tab failed", str(e))
+
+    async def claim(self, session_name: str, url: str):
+        """Swap the warmed tab for url in as the active page of the session, None when there is none."""
+        entries = self.prefetched.get(session_name, {})
+        entry = entries.pop(url_key(url), None)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.started > self.ttl_seconds:
+            await self._close(entry)
+            return None
+        try:
+            await entry.task
+        except Exception as e:
+            logging.info(f"Prefetch of {entry.url} failed, navigating normally: {e}")
+            await self._close(entry)
+            return None
+
+        session = self.browser._sessions[session_name]
+        previous = session.get_active_page()
+        if session.active_tab_id and session.active_tab_id in session.tabs:
+            session.tabs[session.active_tab_id] = entry.page
+        else:
+            session.page = entry.page
+        if previous and previous is not entry.page:
+            await previous.close()
+        self.hits += 1
+        logging.info(f"Using prefetched tab for {url}, loaded {time.monotonic() - entry.started:.1f}s ago")
+        return entry.page
+
+    async def discard(self, session_name: str) -> None:
+        for entry in self.prefetched.pop(session_name, {}).values():
+            await self._close(entry)
+
+    def stats(self):
+        return {"started": self.started, "hits": self.hits, "wasted": self.wasted,
+                "loading": sum(len(entries) for entries in self.prefetched.values())}
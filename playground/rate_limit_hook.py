@@ -4,6 +4,8 @@ import time
 from pyrate_limiter import Limiter, Rate
 from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent
 
+from telemetry import telemetry
+
 
 class RateLimitHook(HookProvider):
 
@@ -15,9 +17,12 @@ class RateLimitHook(HookProvider):
 
     def before_call(self, event: BeforeModelCallEvent) -> None:
         logging.info(f"Validating with limiter for making request {event}")
+        started = time.monotonic()
         while True:
             allowed = self.rate_limit.try_acquire("model", 1)
             if allowed:
                 logging.info(f"Validated to make request {allowed}")
+                telemetry.record("rate_limit_wait", time.monotonic() - started, {"role": event.agent.name},
+                                 event.agent.state.get("session_id"))
                 return
             time.sleep(6)
\ No newline at end of file
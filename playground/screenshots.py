@@ -0,0 +1,69 @@
+import io
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image
+
+logging.basicConfig(level=logging.INFO)
+
+# Longest image side the vision model works with, larger images are only slower to encode and prefill
+VISION_MAX_SIDE = 1024
+PIL_FORMATS = {"jpeg": "JPEG", "webp": "WEBP", "png": "PNG"}
+
+
+@dataclass
+class Capture:
+    session_name: str
+    image_bytes: bytes
+    format: str
+    width: int
+    height: int
+    # url and DOM hash of the page the screenshot was taken on
+    page: str = ""
+
+
+def encode_image(image_bytes: bytes, format: str = "jpeg", quality: int = 70, max_side: int = VISION_MAX_SIDE):
+    """Downscale an image so its longest side is at most max_side and encode it as jpeg, webp or png."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = image.convert("RGB") if format != "png" else image
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format=PIL_FORMATS[format], quality=quality)
+        return out.getvalue(), image.size
+
+
+class ScreenshotStore:
+    """Screenshots kept in memory under handles, so vision queries never touch the disk."""
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max_items
+        self.captures = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, session_name: str, image_bytes: bytes, format: str, width: int, height: int, page: str = "") -> str:
+        handle = f"screenshot:{uuid.uuid4().hex[:12]}"
+        with self.lock:
+            self.captures[handle] = Capture(session_name, image_bytes, format, width, height, page)
+            while len(self.captures) > self.max_items:
+                self.captures.popitem(last=False)
+        return handle
+
+    def get(self, handle: str) -> Optional[Capture]:
+        with self.lock:
+            capture = self.captures.get(handle)
+            if capture:
+                self.captures.move_to_end(handle)
+            return capture
+
+    def drop_session(self, session_name: str) -> None:
+        with self.lock:
+            for handle in [h for h, c in self.captures.items() if c.session_name == session_name]:
+                del self.captures[handle]
+
+
+screenshot_store = ScreenshotStore()
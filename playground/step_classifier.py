@@ -0,0 +1,70 @@
+import logging
+import re
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+
+ENVIRONMENT_STEP = "ENVIRONMENT_STEP"
+STATE_ESTABLISHING = "STATE_ESTABLISHING"
+ON_PAGE_INTERACTION = "ON_PAGE_INTERACTION"
+
+# Steps which create or tear down the browser environment, see OBSERVER_PROMPT (A)
+ENVIRONMENT_PATTERNS = [
+    r"^(init|initiali[sz]e|start|launch|open|create)\s+(a\s+|the\s+|new\s+)*(browser|session)\b",
+    r"^initsession\b",
+    r"^(close|end|stop|terminate)\s+(the\s+)?(browser|session)\b",
+    r"^closesession\b",
+]
+
+# Navigation / setup steps, see OBSERVER_PROMPT (B)
+STATE_ESTABLISHING_PATTERNS = [
+    r"^(navigate|go|goto|browse|visit|open|load)\s+(to\s+)?(the\s+)?(url\s+|page\s+|site\s+|website\s+)?"
+    r"(https?://\S+|www\.\S+|[a-z0-9-]+(\.[a-z0-9-]+)+)(/\S*)?$",
+    r"^(refresh|reload)(\s+the)?(\s+current)?(\s+page)?$",
+    r"^go\s+(back|forward)$",
+]
+
+# Verbs which always need the observer to look at the page, even when a url is mentioned
+INTERACTION_VERBS = r"^(click|type|enter|fill|select|choose|press|hover|scroll|submit|add|remove|verify|check|close\s+(the\s+)?modal)\b"
+
+
+def _normalize(step: str) -> str:
+    step = step.strip().lower()
+    # Planner steps are often numbered or quoted e.g. "1. Navigate to miniindia.ie"
+    step = re.sub(r"^(step[\s-]*\d+\s*[:.)-]\s*|\d+\s*[.)-]\s*)", "", step)
+    return step.strip(" \"'`.")
+
+
+def classify_step(step: str) -> Optional[str]:
+    """
+    Deterministically classify a plan step.
+
+    Returns ENVIRONMENT_STEP or STATE_ESTABLISHING when the step is recognised,
+    ON_PAGE_INTERACTION for obvious page actions and None when unsure, in which
+    case the observer model should decide.
+    """
+    if not step:
+        return None
+    normalized = _normalize(step)
+
+    if re.match(INTERACTION_VERBS, normalized):
+        return ON_PAGE_INTERACTION
+
+    for pattern in ENVIRONMENT_PATTERNS:
+        if re.match(pattern, normalized):
+            return ENVIRONMENT_STEP
+
+    for pattern in STATE_ESTABLISHING_PATTERNS:
+        if re.match(pattern, normalized):
+            return STATE_ESTABLISHING
+
+    return None
+
+
+def approved(step_type: str, reason: str) -> str:
+    return f"STEP_TYPE: {step_type}\nOBSERVATION:\nAPPROVED\nREASON:\n- {reason}"
+
+
+def rejected(step_type: str, issue: str, suggestion: str) -> str:
+    return (f"STEP_TYPE: {step_type}\nOBSERVATION:\nREJECTED\nIssues:\n- {issue}\n"
+            f"Suggested additions or corrections:\n- {suggestion}")
@@ -1,16 +1,67 @@
 
+import json
 import logging
+import re
+from typing import List
+
 from strands import Agent
 from strands.tools import tool
 from strands.types.content import ContentBlock, Message
 from visual_agent import SYSTEM_PROMPT
 from visual_agent import llama_model
+from playground.screenshots import screenshot_store
+from playground.visual_cache import visual_query_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model of the Visual Assistant, set_visual_model replaces it e.g. with the cascade model of the "visual" role
+visual_model = llama_model
+
+
+def set_visual_model(model) -> None:
+    global visual_model
+    visual_model = model
+
+
+def load_image(image_path: str):
+    """
+    Return bytes, format and cache scope of a screenshot handle or an image file.
+
+    The scope is (session, page) of a screenshot handle, image files are not
+    tied to a page and get None, their answers are not cached.
+    """
+    capture = screenshot_store.get(image_path)
+    if capture:
+        return capture.image_bytes, capture.format, (capture.session_name, capture.page)
+    with open(image_path, "rb") as f:
+        return f.read(), "png", None
+
+
+def ask_visual_agent(text: str, image_bytes: bytes, image_format: str) -> str:
+    text_block: ContentBlock = {
+        "text": text
+    }
 
+    image_block: ContentBlock = {
+        "image": {
+            "format": image_format,
+            "source": {
+                "bytes": image_bytes
+            }
+        }
+    }
 
+    message: Message = {
+        "role": "user",
+        "content": [text_block, image_block]
+    }
+    visual_agent = Agent(
+        name="Visual Assistant",
+        system_prompt=SYSTEM_PROMPT,
+        model=visual_model,
+    )
+    return str(visual_agent(prompt=[message]))
 
 
 @tool
@@ -35,9 +86,11 @@ def query_image(image_path: str, query: str) :
     ─────────────────────────────
 
     IMAGE INPUT:
-    - `image_path` MUST be a valid file path on disk
+    - `image_path` MUST be a screenshot handle returned by capture_screenshot
+      (preferred, the image stays in memory and is already downscaled)
+      or a valid file path on disk
     - The image MUST already exist (usually created by a prior screenshot step)
-    - Image format is expected to be PNG
+    - Image files on disk are expected to be PNG
 
     QUERY INPUT:
     - `query` MUST be a clear, specific, natural-language question
@@ -54,6 +107,12 @@ def query_image(image_path: str, query: str) :
     - The tool does NOT modify browser or page state
     - Results are observational evidence only
 
+    CACHING:
+    - Answers of screenshot handles are cached per (session, page url and DOM,
+      perceptual image hash, normalized query), asking the same question about
+      an unchanged page returns the cached answer. Browser actions which may
+      change the page clear the session's answers
+
     RETURN VALUE:
     - On success:
         ToolResponse(status="success", result=<visual analysis output>)
@@ -79,34 +138,83 @@ def query_image(image_path: str, query: str) :
 
     Args:
         image_path (str):
-            Absolute or relative path to the screenshot image file.
+            Screenshot handle, or absolute or relative path to the screenshot image file.
         query (str):
             Natural-language question about the image contents.
 
     """
-    with open(image_path, "rb") as f:
-        image_bytes = f.read()
+    image_bytes, image_format, scope = load_image(image_path)
+    if scope is None:
+        return ask_visual_agent(query, image_bytes, image_format)
+    image_hash = visual_query_cache.image_hash(image_bytes)
+    cached = visual_query_cache.get(*scope, image_hash, query)
+    if cached is not None:
+        logger.info(f"Visual query cache hit: {query} {visual_query_cache.stats()}")
+        return cached
 
-    text_block: ContentBlock = {
-        "text": query
-    }
+    answer = ask_visual_agent(query, image_bytes, image_format)
+    visual_query_cache.put(*scope, image_hash, query, answer)
+    return answer
 
-    image_block: ContentBlock = {
-        "image": {
-            "format": "png",
-            "source": {
-                "bytes": image_bytes
-            }
-        }
-    }
 
-    message: Message = {
-        "role": "user",
-        "content": [text_block, image_block]
-    }
-    visual_agent = Agent(
-        name="Visual Assistant",
-        system_prompt=SYSTEM_PROMPT,
-        model=llama_model,
-    )
-    return visual_agent(prompt=[message])
+BATCH_INSTRUCTIONS = """Answer every question below using ONLY what is visible in the image.
+Respond with JSON only, in this exact format:
+{"answers": [{"id": <question number>, "answer": "<short answer>"}]}
+
+Questions:
+"""
+
+
+def parse_batch_answers(text: str, count: int) -> List[str]:
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    answers = [None] * count
+    try:
+        for item in json.loads(match.group()).get("answers", []) if match else []:
+            index = int(item.get("id", 0)) - 1
+            if 0 <= index < count:
+                answers[index] = str(item.get("answer", "")).strip()
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        logger.warning(f"Could not parse batched visual answers: {text}")
+    return answers
+
+
+@tool
+def query_image_batch(image_path: str, questions: List[str]):
+    """
+    Asks several questions about the same screenshot in ONE visual analysis.
+
+    Prefer this over repeated query_image calls whenever more than one fact
+    is needed from the same image, e.g.
+        ["Is a modal dialog open?", "Is there an Eircode field?", "Is the Collection option visible?"]
+
+    - `image_path` follows the same contract as query_image (screenshot handle or file path)
+    - Each question must be independent and answerable from the image alone
+    - The tool does NOT modify browser or page state
+
+    Answers are cached like query_image answers, so a later query_image with one
+    of these questions on the same screenshot is answered without a vision call.
+
+    Args:
+        image_path (str):
+            Screenshot handle, or absolute or relative path to the screenshot image file.
+        questions (List[str]):
+            Natural-language questions about the image contents.
+
+    Returns:
+        JSON list of {"question", "answer"} in the order of the questions.
+        The answer is null when the model did not answer that question.
+    """
+    image_bytes, image_format, scope = load_image(image_path)
+    image_hash = visual_query_cache.image_hash(image_bytes) if scope else None
+
+    answers = [visual_query_cache.get(*scope, image_hash, question) if scope else None for question in questions]
+    pending = [index for index, answer in enumerate(answers) if answer is None]
+    if pending:
+        prompt = BATCH_INSTRUCTIONS + "\n".join(f"{n}. {questions[index]}" for n, index in enumerate(pending, 1))
+        batch_answers = parse_batch_answers(ask_visual_agent(prompt, image_bytes, image_format), len(pending))
+        for index, answer in zip(pending, batch_answers):
+            answers[index] = answer
+            if answer is not None and scope:
+                visual_query_cache.put(*scope, image_hash, questions[index], answer)
+    logger.info(f"Visual batch: {len(questions)} questions, {len(pending)} sent to the model")
+    return json.dumps([{"question": q, "answer": a} for q, a in zip(questions, answers)])
@@ -0,0 +1,59 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO)
+
+
+class VerdictCache:
+    """
+    Observer verdicts keyed by (session, step, page fingerprint).
+    A verdict is only reused while the page is in exactly the same state.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(session_id: str, step: str, fingerprint: str):
+        return session_id, " ".join(step.lower().split()), fingerprint
+
+    def get(self, session_id: str, step: str, fingerprint: Optional[str]) -> Optional[str]:
+        if not fingerprint:
+            return None
+        key = self._key(session_id, step, fingerprint)
+        with self.lock:
+            verdict = self.entries.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        logging.info(f"Observer verdict cache hit for {session_id}: {step}")
+        return verdict
+
+    def put(self, session_id: str, step: str, fingerprint: Optional[str], verdict: str) -> None:
+        # Only cache complete verdicts, partial or failed observer runs must be retried
+        if not fingerprint or ("APPROVED" not in verdict and "REJECTED" not in verdict):
+            return
+        key = self._key(session_id, step, fingerprint)
+        with self.lock:
+            self.entries[key] = verdict
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, session_id: str) -> None:
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == session_id]:
+                del self.entries[key]
+        logging.info(f"Observer verdict cache invalidated for {session_id}")
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
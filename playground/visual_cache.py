@@ -0,0 +1,95 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from playground.page_fingerprint import dhash, hamming
+
+logging.basicConfig(level=logging.INFO)
+
+# 16x16 difference hash, fine enough to notice changed text in a form, coarse enough to ignore a blinking cursor
+HASH_SIZE = 16
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class VisualQueryCache:
+    """
+    Answers of visual queries keyed by (session, page, perceptual image hash, normalized query).
+
+    The page is the url and DOM hash the screenshot was taken on, so an answer
+    is only reused for the same session on an unchanged page. Within it, images
+    whose hashes differ in at most `tolerance` bits count as the same image, so
+    carousel dots or a cursor blink still hit. drop_session clears a session
+    once an action may have changed its page. Entries are evicted least
+    recently used and expire after `ttl_seconds`.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300, tolerance: int = 3):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.tolerance = tolerance
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def image_hash(image_bytes: bytes) -> int:
+        return dhash(image_bytes, HASH_SIZE)
+
+    def _expired(self, created: float) -> bool:
+        return time.monotonic() - created > self.ttl_seconds
+
+    def get(self, session_name: str, page: str, image_hash: int, query: str) -> Optional[str]:
+        query = normalize_query(query)
+        with self.lock:
+            key = (session_name, page, image_hash, query)
+            entry = self.entries.get(key)
+            near = False
+            if entry is None and self.tolerance:
+                key, entry = next(((k, e) for k, e in reversed(self.entries.items())
+                                   if k[:2] == (session_name, page) and k[3] == query
+                                   and hamming(k[2], image_hash) <= self.tolerance), (key, None))
+                near = entry is not None
+            if entry is None or self._expired(entry[1]):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.near_hits += near
+            return entry[0]
+
+    def put(self, session_name: str, page: str, image_hash: int, query: str, answer: str) -> None:
+        with self.lock:
+            key = (session_name, page, image_hash, normalize_query(query))
+            self.entries[key] = (answer, time.monotonic())
+            self.entries.move_to_end(key)
+            for key in [k for k, e in self.entries.items() if self._expired(e[1])]:
+                del self.entries[key]
+                self.evictions += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def drop_session(self, session_name: str) -> None:
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == session_name]:
+                del self.entries[key]
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self.entries), "hits": self.hits, "near_hits": self.near_hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+visual_query_cache = VisualQueryCache()
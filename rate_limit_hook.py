@@ -1,9 +1,12 @@
+import asyncio
 import logging
-
 import time
+
 from pyrate_limiter import Limiter, Rate
 from strands.hooks import HookProvider, HookRegistry, BeforeModelCallEvent
 
+from telemetry import telemetry
+
 
 class RateLimitHook(HookProvider):
 
@@ -13,11 +16,15 @@ class RateLimitHook(HookProvider):
     def register_hooks(self, registry: HookRegistry) -> None:
         registry.add_callback(event_type=BeforeModelCallEvent, callback=self.before_call)
 
-    def before_call(self, event: BeforeModelCallEvent) -> None:
+    async def before_call(self, event: BeforeModelCallEvent) -> None:
+        # Async so waiting for the limiter does not block the event loop other sessions run on
         logging.info("Validating with limiter for making request")
+        started = time.monotonic()
         while True:
             allowed = self.rate_limit.try_acquire("model", 1)
             if allowed:
                 logging.info(f"Validated to make request {allowed}")
+                telemetry.record("rate_limit_wait", time.monotonic() - started, {"role": event.agent.name},
+                                 event.agent.state.get("session_id"))
                 return
-            time.sleep(6)
\ No newline at end of file
+            await asyncio.sleep(6)
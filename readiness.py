@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+logging.basicConfig(level=logging.INFO)
+
+# Resolves once the DOM went quiet_ms without mutations, or with false after max_ms
+DOM_STABLE_SCRIPT = """
+([quietMs, maxMs]) => new Promise(resolve => {
+    let timer;
+    let cap;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done(true), quietMs);
+    });
+    const done = (stable) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(cap);
+        resolve(stable);
+    };
+    observer.observe(document.documentElement || document,
+        {childList: true, subtree: true, attributes: true, characterData: true});
+    timer = setTimeout(() => done(true), quietMs);
+    cap = setTimeout(() => done(false), maxMs);
+})
+"""
+
+# Long lived requests which never finish and would keep the network busy forever
+IGNORED_RESOURCE_TYPES = {"websocket", "eventsource"}
+
+
+class NetworkTracker:
+    """In-flight requests of one page and the time the count last changed."""
+
+    def __init__(self, page):
+        self.in_flight = set()
+        self.last_change = time.monotonic()
+        page.on("request", self._started)
+        page.on("requestfinished", self._finished)
+        page.on("requestfailed", self._finished)
+
+    def _started(self, request):
+        if request.resource_type in IGNORED_RESOURCE_TYPES:
+            return
+        self.in_flight.add(request)
+        self.last_change = time.monotonic()
+
+    def _finished(self, request):
+        if request in self.in_flight:
+            self.in_flight.discard(request)
+            self.last_change = time.monotonic()
+
+
+class PageReadiness:
+    """
+    Waits until a page is usable instead of sleeping a fixed time or waiting for the load event.
+
+    A page is ready once DOMContentLoaded fired, at most max_in_flight requests
+    stayed open for network_quiet_ms, and the DOM saw no mutation for
+    dom_quiet_ms. Whatever is still pending after timeout_ms is given up on and
+    the page is used as it is. Every wait is recorded for stats().
+    """
+
+    def __init__(self, network_quiet_ms: int = 500, max_in_flight: int = 2, dom_quiet_ms: int = 300,
+                 timeout_ms: int = 10000, window: int = 500):
+        self.network_quiet_ms = network_quiet_ms
+        self.max_in_flight = max_in_flight
+        self.dom_quiet_ms = dom_quiet_ms
+        self.timeout_ms = timeout_ms
+        self.trackers = weakref.WeakKeyDictionary()
+        self.waits = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def track(self, page) -> NetworkTracker:
+        """Start counting requests of the page, call before navigating so the first requests are seen."""
+        if page not in self.trackers:
+            self.trackers[page] = NetworkTracker(page)
+        return self.trackers[page]
+
+    async def _network_quiet(self, tracker: NetworkTracker) -> None:
+        quiet = self.network_quiet_ms / 1000
+        while True:
+            idle = time.monotonic() - tracker.last_change
+            if len(tracker.in_flight) <= self.max_in_flight and idle >= quiet:
+                return
+            await asyncio.sleep(0.05)
+
+    async def _dom_stable(self, page, timeout_ms: int) -> bool:
+        for _ in range(3):
+            try:
+                return await page.evaluate(DOM_STABLE_SCRIPT, [self.dom_quiet_ms, timeout_ms])
+            except Exception as e:
+                # A navigation destroyed the execution context, wait for the new document and observe it
+                logging.debug("exception=<%s> | DOM stability check restarted", str(e))
+                await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+        return False
+
+    async def wait_ready(self, page, label: str = "", timeout_ms: int = None) -> dict:
+        timeout_ms = timeout_ms or self.timeout_ms
+        started = time.monotonic()
+        tracker = self.track(page)
+        phases = {}
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout_ms)
+            phases["dom_content_loaded"] = time.monotonic() - started
+            remaining = max(0.0, timeout_ms / 1000 - phases["dom_content_loaded"])
+            _, dom = await asyncio.wait_for(
+                asyncio.gather(self._network_quiet(tracker), self._dom_stable(page, int(remaining * 1000))),
+                timeout=remaining)
+            reason = "ready" if dom else "dom_busy"
+        except asyncio.TimeoutError:
+            reason = "timeout"
+        except Exception as e:
+            logging.debug("exception=<%s> | readiness wait failed", str(e))
+            reason = "error"
+        waited = time.monotonic() - started
+        self.record(label, waited, reason, len(tracker.in_flight))
+        return {"waited": waited, "reason": reason, "in_flight": len(tracker.in_flight), **phases}
+
+    def record(self, label: str, waited: float, reason: str, in_flight: int = 0) -> None:
+        with self.lock:
+            self.waits.append((label, waited, reason))
+        logging.info(f"Page ready after {waited:.2f}s ({reason}, {in_flight} requests open) {label}")
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(waited for _, waited, _ in self.waits)
+            reasons = {}
+            for _, _, reason in self.waits:
+                reasons[reason] = reasons.get(reason, 0) + 1
+        if not waits:
+            return {"count": 0}
+        return {
+            "count": len(waits),
+            "mean_seconds": sum(waits) / len(waits),
+            "p50_seconds": waits[len(waits) // 2],
+            "p95_seconds": waits[min(len(waits) - 1, int(len(waits) * 0.95))],
+            "max_seconds": waits[-1],
+            "reasons": reasons,
+        }
+
+
+page_readiness = PageReadiness(
+    network_quiet_ms=int(os.getenv("READY_NETWORK_QUIET_MS", "500")),
+    max_in_flight=int(os.getenv("READY_MAX_IN_FLIGHT", "2")),
+    dom_quiet_ms=int(os.getenv("READY_DOM_QUIET_MS", "300")),
+    timeout_ms=int(os.getenv("READY_TIMEOUT_MS", "10000")),
+)
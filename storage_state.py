@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+
+logging.basicConfig(level=logging.INFO)
+
+# Bump when the layout of the stored files changes, older files are ignored.
+# Version 1 profiles were shared by all sessions of a host and are never loaded again.
+STATE_FORMAT_VERSION = 2
+
+
+def storage_profile(profile_id: str, host: str) -> str:
+    """
+    Profile of one host for one configured profile id, e.g. a user name. Every
+    session browsing with the same id starts from the state the others saved,
+    profiles are never shared between ids.
+    """
+    return f"{profile_id}/{host.lower()}"
+
+
+def profile_host(profile: str) -> str:
+    return profile.rsplit("/", 1)[-1]
+
+
+def _cookie_matches(cookie: dict, host: str) -> bool:
+    domain = cookie.get("domain", "").lstrip(".").lower()
+    return bool(domain) and (host == domain or host.endswith("." + domain))
+
+
+def state_for_host(state: dict, host: str) -> dict:
+    """The part of a context storage state the host can see: its cookies and its own origins."""
+    host = host.lower()
+    return {
+        "cookies": [c for c in state.get("cookies", []) if _cookie_matches(c, host)],
+        "origins": [o for o in state.get("origins", []) if (urlparse(o.get("origin", "")).hostname or "") == host],
+    }
+
+
+def merge_states(states: List[dict]) -> Optional[dict]:
+    """One storage state from the states of several hosts, later cookies win."""
+    if not states:
+        return None
+    cookies, origins = {}, {}
+    for state in states:
+        for cookie in state.get("cookies", []):
+            cookies[(cookie.get("name"), cookie.get("domain"), cookie.get("path"))] = cookie
+        for origin in state.get("origins", []):
+            origins[origin.get("origin")] = origin
+    return {"cookies": list(cookies.values()), "origins": list(origins.values())}
+
+
+class StorageStateStore:
+    """
+    Playwright storage states (cookies, localStorage, IndexedDB) saved per profile on disk.
+
+    A profile is profile_id/host, see storage_profile, so a saved login is only
+    ever loaded again by sessions browsing with the profile id which made it.
+
+    Every save writes a new version, the newest keep_versions are kept. A
+    version older than ttl_seconds is expired and never loaded, and cookies
+    which expired since the save are dropped on load.
+    """
+
+    def __init__(self, root: str = "storage_state", ttl_seconds: float = 7 * 24 * 3600, keep_versions: int = 3):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.keep_versions = keep_versions
+        self.lock = threading.Lock()
+
+    def _dir(self, profile: str) -> str:
+        # Leading dots are replaced as well, no part may climb out of root
+        return os.path.join(self.root, *(re.sub(r"^\.|[^\w.-]", "_", part) for part in profile.split("/")))
+
+    def versions(self, profile: str):
+        """Version numbers of the profile, newest first."""
+        try:
+            names = os.listdir(self._dir(profile))
+        except FileNotFoundError:
+            return []
+        return sorted((int(name[:-5]) for name in names if re.fullmatch(r"\d+\.json", name)), reverse=True)
+
+    def _path(self, profile: str, version: int) -> str:
+        return os.path.join(self._dir(profile), f"{version:06d}.json")
+
+    def _read(self, profile: str, version: int) -> Optional[dict]:
+        try:
+            with open(self._path(profile, version)) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable storage state {profile} v{version}: {e}")
+            return None
+
+    def load(self, profile: str) -> Optional[dict]:
+        """Newest unexpired storage state of the profile, usable as new_context(storage_state=...)."""
+        with self.lock:
+            for version in self.versions(profile):
+                record = self._read(profile, version)
+                if not record or record.get("format") != STATE_FORMAT_VERSION:
+                    continue
+                if record["saved_at"] + self.ttl_seconds < time.time():
+                    logging.info(f"Storage state {profile} v{version} expired")
+                    break
+                state = record["state"]
+                now = time.time()
+                # Session cookies have expires -1 and are kept
+                state["cookies"] = [c for c in state.get("cookies", []) if c.get("expires", -1) < 0 or c["expires"] > now]
+                logging.info(f"Loaded storage state {profile} v{version}")
+                return state
+        return None
+
+    def save(self, profile: str, state: dict) -> Optional[int]:
+        """Store a new version unless it equals the latest one, returns the new version number."""
+        digest = hashlib.sha256(json.dumps(state, sort_keys=True).encode("utf-8")).hexdigest()
+        with self.lock:
+            versions = self.versions(profile)
+            latest = self._read(profile, versions[0]) if versions else None
+            if latest and latest.get("digest") == digest:
+                return None
+            version = versions[0] + 1 if versions else 1
+            os.makedirs(self._dir(profile), exist_ok=True)
+            record = {"format": STATE_FORMAT_VERSION, "profile": profile, "version": version,
+                      "saved_at": time.time(), "digest": digest, "state": state}
+            tmp_path = self._path(profile, version) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self._path(profile, version))
+            for old in versions[self.keep_versions - 1:]:
+                os.remove(self._path(profile, old))
+        logging.info(f"Saved storage state {profile} v{version}")
+        return version
+
+    def expire(self) -> int:
+        """Delete versions past their ttl in all profiles, returns how many were removed."""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        with self.lock:
+            profiles = [f"{owner}/{host}" for owner in os.listdir(self.root)
+                        if os.path.isdir(os.path.join(self.root, owner))
+                        for host in os.listdir(os.path.join(self.root, owner))
+                        if os.path.isdir(os.path.join(self.root, owner, host))]
+            for profile in profiles:
+                for version in self.versions(profile):
+                    record = self._read(profile, version)
+                    if record is None or record.get("saved_at", 0) + self.ttl_seconds < time.time():
+                        os.remove(self._path(profile, version))
+                        removed += 1
+        return removed
@@ -1,9 +1,20 @@
 import logging
+import os
+import time
+
 import gradio as gr
 from strands.models import BedrockModel
 
+from admission import AdmissionController, Overloaded
+from agent_pool import AgentPool
+from artifacts import ARTIFACT_TOOLS, artifact_store
+from browse_manager import browser_manager
+from history_compactor import HistoryCompactor
 from rate_limit_hook import RateLimitHook
-from tools import browse
+from readiness import page_readiness
+from streaming import stream_chat
+from telemetry import telemetry
+from tools import browse, search_page
 
 from strands import ToolContext, Agent
 from strands.types.tools import ToolUse
@@ -23,23 +34,79 @@ bedrock_model = BedrockModel(
     temperature=0.5,
 )
 
-agent = Agent(
-    name="Browser Controller Agent",
-    system_prompt=SYSTEM_PROMPT,
-    model=bedrock_model,
-    tools=[browse],
-    hooks=[RateLimitHook()]
+# Shared by all sessions, so the model call limit stays global
+rate_limit_hook = RateLimitHook()
+# Raw HTML from browse is stubbed out of the history once it is a few turns old
+history_compactor = HistoryCompactor(keep_turns=int(os.getenv("HISTORY_KEEP_TOOL_TURNS", "2")))
+
+
+def create_agent() -> Agent:
+    return Agent(
+        name="Browser Controller Agent",
+        system_prompt=SYSTEM_PROMPT,
+        model=bedrock_model,
+        tools=[browse, search_page] + ARTIFACT_TOOLS,
+        # Telemetry last, its model call spans start after the limiter and compaction
+        hooks=[rate_limit_hook, history_compactor, telemetry]
+    )
+
+
+agent_pool = AgentPool(
+    create_agent,
+    max_agents=int(os.getenv("MAX_SESSION_AGENTS", "32")),
+    max_concurrency=int(os.getenv("MAX_CONCURRENT_RUNS", "4")),
+    on_evict=artifact_store.drop_session,
 )
 
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MAX_CONCURRENT_RUNS", "4")),
+    max_queue=int(os.getenv("MAX_QUEUED_RUNS", "16")),
+    max_wait_seconds=float(os.getenv("MAX_QUEUE_WAIT_SECONDS", "300")),
+)
+
+# Set METRICS_PORT to 0 to not serve the metrics endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+telemetry.register_collector("admission", admission.metrics)
+telemetry.register_collector("agent_pool", agent_pool.stats)
+telemetry.register_collector("browser", browser_manager.metrics)
+telemetry.register_collector("host_limiter", browser_manager.host_limiter.metrics, label="host")
+if browser_manager.asset_cache:
+    telemetry.register_collector("asset_cache", browser_manager.asset_cache.metrics)
+telemetry.register_collector("readiness", page_readiness.stats)
+telemetry.register_collector("artifacts", artifact_store.stats)
+
 
 async def chat(message, history, request: gr.Request):
     try:
-        # Execute the agent
-        result = agent(message, session_id=request.session_hash)
-        return str(result)
+        ticket = admission.enter()
+    except Overloaded as e:
+        logging.warning(f"Rejecting request: {e} {admission.metrics()}")
+        telemetry.count("admission_rejected_total")
+        yield f"The assistant is busy ({e}). Please try again in about {e.estimated_wait:.0f}s."
+        return
+    queued = time.monotonic()
+    try:
+        if ticket.position:
+            yield f"Busy, you are number {ticket.position} in the queue (about {ticket.estimated_wait:.0f}s)."
+        async with ticket:
+            telemetry.record("admission_wait", time.monotonic() - queued, session_id=request.session_hash)
+            # Stream model text and tool progress of this session's agent as it happens
+            # Logged in users browse with their own storage state profile, see tools.STORAGE_PROFILE_ID otherwise
+            async for partial in stream_chat(agent_pool.stream(request.session_hash, message,
+                                                               profile_id=request.username)):
+                yield partial
     except Exception as e:
         logging.exception("Agent error")
-        return f"Error: {str(e)}"
+        yield f"Error: {str(e)}"
+    finally:
+        ticket.abandon()
+        logging.info(f"Admission metrics: {admission.metrics()}")
+        logging.info(f"Time by span: {telemetry.summary(request.session_hash, top=5)}")
 
-# Launch Gradio
-gr.ChatInterface(chat).launch()
+if __name__ == "__main__":
+    # Playwright, the browser and spare contexts start while Gradio starts
+    browser_manager.prewarm(spare_contexts=int(os.getenv("PREWARM_CONTEXTS", "2")))
+    if METRICS_PORT:
+        telemetry.serve(METRICS_PORT)
+    # Launch Gradio
+    gr.ChatInterface(chat, concurrency_limit=None).launch()
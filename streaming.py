@@ -0,0 +1,57 @@
+import re
+from typing import AsyncIterator, Optional
+
+VERDICTS = ("REJECTED", "APPROVED")
+MAX_SUMMARY = 120
+
+
+def summarize_tool_result(tool_result) -> str:
+    """One line summary of a tool result, e.g. 'APPROVED' or the action the executor took."""
+    text = " ".join(str(block.get("text") or block.get("json") or "") for block in tool_result.get("content", []))
+    for verdict in VERDICTS:
+        if verdict in text:
+            return verdict
+    action = re.search(r"action_taken\W+([^\n\"']+)", text)
+    if action:
+        return action.group(1).strip()[:MAX_SUMMARY]
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    summary = f"{tool_result.get('status', 'success')}: {first_line}" if first_line else tool_result.get("status", "")
+    return summary[:MAX_SUMMARY]
+
+
+def tool_progress(event: dict, tool_names: dict) -> Optional[str]:
+    """
+    Progress line for a stream_async event, None for events which are not tool progress.
+    tool_names maps toolUseId -> tool name and is filled from the model messages.
+    """
+    message = event.get("message")
+    if not message:
+        return None
+    lines = []
+    for block in message.get("content", []):
+        if "toolUse" in block:
+            tool_names[block["toolUse"]["toolUseId"]] = block["toolUse"]["name"]
+            lines.append(f"{block['toolUse']['name']}: started")
+        elif "toolResult" in block:
+            name = tool_names.get(block["toolResult"]["toolUseId"], "tool")
+            lines.append(f"{name}: {summarize_tool_result(block['toolResult'])}")
+    return "\n".join(lines) or None
+
+
+async def stream_chat(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """
+    Turn agent stream_async events into the growing chat message Gradio expects,
+    model text as it is generated with tool progress lines in between.
+    """
+    tool_names = {}
+    transcript = ""
+    async for event in events:
+        if "data" in event:
+            transcript += event["data"]
+        else:
+            line = tool_progress(event, tool_names)
+            if not line:
+                continue
+            parts = "\n\n".join(f"`{part}`" for part in line.splitlines())
+            transcript = f"{transcript.rstrip()}\n\n{parts}\n\n" if transcript else f"{parts}\n\n"
+        yield transcript
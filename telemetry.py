@@ -0,0 +1,303 @@
+import bisect
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from strands.hooks import HookProvider, HookRegistry, BeforeInvocationEvent, AfterInvocationEvent, \
+    BeforeModelCallEvent, AfterModelCallEvent, BeforeToolCallEvent, AfterToolCallEvent
+
+logging.basicConfig(level=logging.INFO)
+
+# Upper bounds in seconds, from a cached grep to a slow model call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels_text(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _samples(name: str, value, labels):
+    """Numeric leaves of a metrics value as (name, labels, value), keys of a nested dict become the key label."""
+    if isinstance(value, (bool, int, float)):
+        yield name, labels, float(value)
+    elif isinstance(value, dict) and not any(label == "key" for label, _ in labels):
+        for key, item in value.items():
+            yield from _samples(name, item, labels + (("key", key),))
+
+
+def _result_bytes(result) -> int:
+    size = 0
+    for block in (result or {}).get("content", []):
+        if "text" in block:
+            size += len(block["text"].encode("utf-8", "replace"))
+        elif "json" in block:
+            size += len(json.dumps(block["json"], default=str))
+        elif "image" in block:
+            size += len(block["image"].get("source", {}).get("bytes", b""))
+    return size
+
+
+class Telemetry(HookProvider):
+    """
+    Spans of agent runs, model calls and tool calls, plus timers of browser operations.
+
+    Every span feeds a latency histogram labelled by role (the agent name), tool
+    or operation, and the per session time summary. Token usage of agent runs and
+    the size of tool results are counted per role and tool. With trace_path set,
+    each span is appended to that file as one JSON line with its session_id.
+    serve() exposes everything, plus the registered collectors, as Prometheus text.
+    Add the hook last to an agent, so limiter waits and history compaction
+    are not counted as model latency.
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, max_sessions: int = 256):
+        self.lock = threading.Lock()
+        self.histograms: Dict[tuple, Histogram] = {}
+        self.counters: Dict[tuple, float] = {}
+        self.collectors = {}
+        self.sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self.open_spans = {}
+        self.trace = open(trace_path, "a", buffering=1, encoding="utf-8") if trace_path else None
+        self.server = None
+
+    # ---------- RECORDING ----------
+
+    def record(self, metric: str, seconds: float, labels: Optional[dict] = None, session_id: Optional[str] = None,
+               started_at: Optional[float] = None, error: Optional[str] = None, **attributes) -> None:
+        """Record one finished span of metric into its histogram, the session summary and the trace."""
+        key = (metric, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                errors = (f"{metric}_errors_total", key[1])
+                self.counters[errors] = self.counters.get(errors, 0) + 1
+            if session_id:
+                self._add_to_session(session_id, metric, labels, seconds)
+            if self.trace:
+                self.trace.write(json.dumps({
+                    "ts": started_at if started_at is not None else time.time() - seconds,
+                    "span": metric, "seconds": round(seconds, 6), "session_id": session_id,
+                    **(labels or {}), **({"error": error} if error else {}), **attributes,
+                }, default=str) + "\n")
+
+    def count(self, metric: str, value: float = 1, **labels) -> None:
+        key = (metric, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, metric: str, session_id: Optional[str] = None, **labels):
+        """Time the block, works around awaits as well."""
+        started, started_at = time.monotonic(), time.time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(metric, time.monotonic() - started, labels, session_id, started_at, error)
+
+    def _add_to_session(self, session_id: str, metric: str, labels: Optional[dict], seconds: float) -> None:
+        summary = self.sessions.pop(session_id, None) or {}
+        self.sessions[session_id] = summary
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        name = metric + "".join(f" {value}" for _, value in sorted((labels or {}).items()))
+        count, total = summary.get(name, (0, 0.0))
+        summary[name] = (count + 1, total + seconds)
+
+    def summary(self, session_id: str, top: int = 10):
+        """Where the time of the session went, the spans with the most total seconds first."""
+        with self.lock:
+            summary = dict(self.sessions.get(session_id, {}))
+        spans = sorted(summary.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return [{"span": name, "count": count, "seconds": round(total, 3)} for name, (count, total) in spans]
+
+    # ---------- HOOKS ----------
+
+    def register_hooks(self, registry: HookRegistry) -> None:
+        registry.add_callback(event_type=BeforeInvocationEvent, callback=self.before_invocation)
+        registry.add_callback(event_type=AfterInvocationEvent, callback=self.after_invocation)
+        registry.add_callback(event_type=BeforeModelCallEvent, callback=self.before_model_call)
+        registry.add_callback(event_type=AfterModelCallEvent, callback=self.after_model_call)
+        registry.add_callback(event_type=BeforeToolCallEvent, callback=self.before_tool_call)
+        registry.add_callback(event_type=AfterToolCallEvent, callback=self.after_tool_call)
+
+    def _open(self, key, **extra) -> None:
+        self.open_spans[key] = (time.monotonic(), time.time(), extra)
+
+    def _close(self, key):
+        return self.open_spans.pop(key, None)
+
+    def before_invocation(self, event: BeforeInvocationEvent) -> None:
+        self._open(("agent", id(event.agent)), usage=dict(event.agent.event_loop_metrics.accumulated_usage))
+
+    def after_invocation(self, event: AfterInvocationEvent) -> None:
+        opened = self._close(("agent", id(event.agent)))
+        if opened is None:
+            return
+        started, started_at, extra = opened
+        role = event.agent.name
+        usage = event.agent.event_loop_metrics.accumulated_usage
+        input_tokens = usage.get("inputTokens", 0) - extra["usage"].get("inputTokens", 0)
+        output_tokens = usage.get("outputTokens", 0) - extra["usage"].get("outputTokens", 0)
+        self.count("agent_input_tokens_total", input_tokens, role=role)
+        self.count("agent_output_tokens_total", output_tokens, role=role)
+        self.record("agent_run", time.monotonic() - started, {"role": role}, event.agent.state.get("session_id"),
+                    started_at, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def before_model_call(self, event: BeforeModelCallEvent) -> None:
+        self._open(("model", id(event.agent)))
+
+    def after_model_call(self, event: AfterModelCallEvent) -> None:
+        opened = self._close(("model", id(event.agent)))
+        if opened is None:
+            return
+        started, started_at, _ = opened
+        stop_reason = event.stop_response.stop_reason if event.stop_response else None
+        self.record("model_call", time.monotonic() - started, {"role": event.agent.name},
+                    event.agent.state.get("session_id"), started_at,
+                    type(event.exception).__name__ if event.exception else None, stop_reason=stop_reason)
+
+    def before_tool_call(self, event: BeforeToolCallEvent) -> None:
+        self._open(("tool", id(event.agent), event.tool_use["toolUseId"]))
+
+    def after_tool_call(self, event: AfterToolCallEvent) -> None:
+        opened = self._close(("tool", id(event.agent), event.tool_use["toolUseId"]))
+        if opened is None:
+            return
+        started, started_at, _ = opened
+        tool_name = event.tool_use["name"]
+        size = _result_bytes(event.result)
+        self.count("tool_result_bytes_total", size, tool=tool_name)
+        error = type(event.exception).__name__ if event.exception else \
+            "error" if (event.result or {}).get("status") == "error" else None
+        session_id = event.invocation_state.get("session_id") or event.agent.state.get("session_id")
+        self.record("tool_call", time.monotonic() - started, {"tool": tool_name, "role": event.agent.name},
+                    session_id, started_at, error, result_bytes=size)
+
+    # ---------- EXPORT ----------
+
+    def register_collector(self, name: str, collect: Callable[[], dict], label: Optional[str] = None) -> None:
+        """
+        Export the numbers of collect() as gauges prefixed with name. With label,
+        collect() returns one dict per label value, e.g. per host.
+        """
+        self.collectors[name] = (collect, label)
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self.lock:
+            histograms = {key: (list(h.counts), h.sum, h.count, h.buckets) for key, h in self.histograms.items()}
+            counters = dict(self.counters)
+        typed = set()
+        for (metric, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            name = _metric_name(f"{metric}_seconds")
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels_text(labels)} {total}")
+            lines.append(f"{name}_count{_labels_text(labels)} {count}")
+        for (metric, labels), value in sorted(counters.items()):
+            name = _metric_name(metric)
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels_text(labels)} {value}")
+        for collector, (collect, label) in list(self.collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                logging.warning(f"Metrics collector {collector} failed: {e}")
+                continue
+            if label:
+                groups = [(((label, key),), group) for key, group in values.items()]
+            else:
+                groups = [((), values)]
+            for labels, group in groups:
+                for key, item in group.items():
+                    for name, sample_labels, value in _samples(_metric_name(f"{collector}_{key}"), item, labels):
+                        if name not in typed:
+                            typed.add(name)
+                            lines.append(f"# TYPE {name} gauge")
+                        lines.append(f"{name}{_labels_text(sample_labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /summary?session_id= (JSON) from a daemon thread."""
+        if self.server:
+            return self.server
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/metrics":
+                    body, content_type = telemetry.prometheus_text().encode(), "text/plain; version=0.0.4"
+                elif url.path == "/summary":
+                    session_id = parse_qs(url.query).get("session_id", [""])[0]
+                    body, content_type = json.dumps(telemetry.summary(session_id)).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # E.g. the other app already serves on the port, the app runs fine without the endpoint
+            logging.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return None
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="metrics-server").start()
+        logging.info(f"Metrics on http://{host}:{port}/metrics")
+        return self.server
+
+
+# Set TRACE_FILE to append every span as a JSON line
+telemetry = Telemetry(trace_path=os.getenv("TRACE_FILE") or None)
\ No newline at end of file
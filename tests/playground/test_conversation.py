@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from strands.types.exceptions import ContextWindowOverflowException
+
+from playground.conversation import TokenBudgetConversationManager, SUMMARY_PREFIX, estimate_tokens, render_block
+
+
+def text(role, value):
+    return {"role": role, "content": [{"text": value}]}
+
+
+def tool_use(tool_id="t1"):
+    return {"role": "assistant", "content": [{"toolUse": {"toolUseId": tool_id, "name": "browser", "input": {"x": 1}}}]}
+
+
+def tool_result(tool_id="t1"):
+    return {"role": "user", "content": [{"toolResult": {"toolUseId": tool_id, "status": "success",
+                                                         "content": [{"text": "<html>" + "x" * 400}]}}]}
+
+
+def agent(messages):
+    return SimpleNamespace(name="Test Agent", messages=messages)
+
+
+def test_estimate_tokens_counts_images_and_text():
+    message = {"role": "user", "content": [{"text": "x" * 400}, {"image": {"format": "png"}}]}
+    assert estimate_tokens(message) == 4 + 100 + 1000
+
+
+def test_render_block_of_tool_calls_and_results():
+    assert render_block(tool_use()["content"][0]).startswith("[tool call browser]")
+    assert render_block(tool_result()["content"][0]).startswith("[tool result success] <html>")
+
+
+def test_split_point_never_separates_a_tool_result_from_its_call():
+    manager = TokenBudgetConversationManager()
+    messages = [text("user", "goal"), tool_use(), tool_result(), text("assistant", "done")]
+    # Preserving two would start the kept turns at the toolResult, the split moves past it
+    assert manager._split_point(messages, 2) == 3
+    assert manager._split_point(messages, 1) == 3
+
+
+def test_split_point_is_zero_when_nothing_can_be_folded():
+    manager = TokenBudgetConversationManager()
+    # Only the toolResult is newer than the split, moving past it leaves nothing to preserve
+    assert manager._split_point([text("user", "goal"), tool_use(), tool_result()], 1) == 0
+    with pytest.raises(ContextWindowOverflowException):
+        manager.fold(agent([text("user", "goal")]), 2)
+
+
+def test_fold_keeps_roles_alternating():
+    manager = TokenBudgetConversationManager(preserve_recent_messages=2)
+    messages = [text("user", "goal"), text("assistant", "a1"), text("user", "u2"), text("assistant", "a2")]
+    manager.fold(agent(messages), 2)
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    # The summary joins the first preserved user message
+    assert messages[0]["content"][0]["text"].startswith(SUMMARY_PREFIX)
+    assert messages[0]["content"][1]["text"] == "u2"
+    assert manager.removed_message_count == 2
+
+
+def test_fold_inserts_a_user_summary_before_an_assistant_turn():
+    manager = TokenBudgetConversationManager()
+    messages = [text("user", "goal"), text("assistant", "a1"), text("user", "u2"), text("assistant", "a2")]
+    manager.fold(agent(messages), 1)
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert messages[0]["content"][0]["text"].startswith(SUMMARY_PREFIX)
+
+
+def test_folding_twice_does_not_summarize_the_summary():
+    manager = TokenBudgetConversationManager()
+    messages = [text("user", "goal"), text("assistant", "a1"), text("user", "u2"), text("assistant", "a2")]
+    manager.fold(agent(messages), 1)
+    with pytest.raises(ContextWindowOverflowException):
+        manager.fold(agent(messages), 1)
+
+
+def test_before_model_call_folds_over_budget_history():
+    manager = TokenBudgetConversationManager(max_tokens=100, preserve_recent_messages=2)
+    messages = [text("user" if i % 2 == 0 else "assistant", "x" * 400) for i in range(6)]
+    asyncio.run(manager.before_model_call(SimpleNamespace(agent=agent(messages))))
+    assert len(messages) == 2
+    assert manager.get_state()["summary"]
+
+
+def test_under_budget_history_is_left_alone():
+    manager = TokenBudgetConversationManager(max_tokens=10000)
+    messages = [text("user", "goal"), text("assistant", "a1")]
+    manager.apply_management(agent(messages))
+    assert len(messages) == 2 and manager.removed_message_count == 0
@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from playground.pipeline import (PipelinedOrchestrator, Speculation, Cancellation, SpeculationCancelled, parse_plan,
+                                 predict_state)
+
+APPROVED = "OBSERVATION:\nAPPROVED"
+
+
+def done(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def orchestrator(**kwargs) -> PipelinedOrchestrator:
+    return PipelinedOrchestrator(None, None, None, None, **kwargs)
+
+
+def test_parse_plan_json_and_numbered_lines():
+    assert parse_plan('Plan: {"PLAN": ["Navigate to a.ie", "Click Add"]}') == ["Navigate to a.ie", "Click Add"]
+    assert parse_plan('{"PLAN": {"1": "Navigate to a.ie"}}') == ["Navigate to a.ie"]
+    assert parse_plan("1. Navigate to a.ie\n2. Click Add\nnotes") == ["Navigate to a.ie", "Click Add"]
+
+
+@pytest.mark.parametrize("step,predicted", [
+    ("Verify the cart shows 1 item", "fp"),
+    ("2. Check the price", "fp"),
+    ("Click Add to cart", None),
+    ("Navigate to https://a.ie", None),
+    ("Type K78 into Eircode", None),
+])
+def test_only_read_only_steps_are_predicted(step, predicted):
+    assert predict_state(step, "fp") == predicted
+
+
+def test_nothing_is_predicted_without_a_fingerprint():
+    assert predict_state("Verify the cart", None) is None
+
+
+def test_speculation_used_when_state_matches_the_prediction():
+    pipeline = orchestrator()
+    speculation = Speculation("Click Add", done((APPROVED, "fp")), Cancellation(), "fp")
+    assert pipeline._use_speculation(speculation, "click  add", "fp") == APPROVED
+    assert pipeline.stats()["speculation_hits"] == 1
+
+
+@pytest.mark.parametrize("verdict,seen,after", [
+    (APPROVED, "fp", "other"),   # the step changed the page after all
+    (APPROVED, "other", "fp"),   # the observer looked at another page than predicted
+    (APPROVED, None, "fp"),      # the page changed while the observer looked
+    (None, None, "fp"),          # the speculation was cancelled
+])
+def test_speculation_discarded_when_state_diverged(verdict, seen, after):
+    pipeline = orchestrator()
+    speculation = Speculation("Click Add", done((verdict, seen)), Cancellation(), "fp")
+    assert pipeline._use_speculation(speculation, "Click Add", after) is None
+    assert pipeline.stats() == {"speculation_hits": 0, "speculation_discards": 1, "speculation_skips": 0,
+                                "speculation_hit_rate": 0.0}
+
+
+def test_speculation_cancelled_when_the_plan_changed():
+    pipeline = orchestrator()
+    cancellation = Cancellation()
+    speculation = Speculation("Click Add", Future(), cancellation, "fp")
+    assert pipeline._use_speculation(speculation, "Click Remove", "fp") is None
+    assert cancellation.is_cancelled()
+    with pytest.raises(SpeculationCancelled):
+        cancellation.check(None)
+
+
+def run_pipeline(plans, fingerprints):
+    """Runs a goal with scripted plans and page fingerprints, returns the pipeline and the observed steps."""
+    observed = []
+    lock = threading.Lock()
+    plans, fingerprints = iter(plans), iter(fingerprints)
+
+    def observe(step, executed, session_id, fingerprint, cancellation=None):
+        with lock:
+            observed.append(step)
+        return APPROVED, fingerprint or "fp"
+
+    pipeline = PipelinedOrchestrator(lambda *args: next(plans), observe, lambda *args: "status: success",
+                                     lambda session_id: next(fingerprints), max_steps=5)
+    return pipeline, pipeline.run("goal", "s1"), observed
+
+
+def test_read_only_step_speculation_saves_an_observation():
+    pipeline, result, observed = run_pipeline(
+        ['{"PLAN": ["Verify the cart", "Click Checkout"]}', '{"PLAN": ["Click Checkout"]}', '{"PLAN": []}'],
+        ["fp", "fp", "fp2"])
+    assert result.startswith("Goal completed")
+    assert observed == ["Verify the cart", "Click Checkout"]
+    assert pipeline.stats()["speculation_hits"] == 1
+
+
+def test_no_speculation_past_page_changing_steps():
+    pipeline, result, observed = run_pipeline(
+        ['{"PLAN": ["Click Add", "Click Checkout"]}', '{"PLAN": ["Click Checkout"]}', '{"PLAN": []}'],
+        ["fp", "fp2", "fp3"])
+    assert result.startswith("Goal completed")
+    assert observed == ["Click Add", "Click Checkout"]
+    assert pipeline.stats()["speculation_skips"] == 1
+    assert pipeline.stats()["speculation_hits"] + pipeline.stats()["speculation_discards"] == 0
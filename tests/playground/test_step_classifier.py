@@ -0,0 +1,52 @@
+import pytest
+
+from playground.step_classifier import (classify_step, approved, rejected, ENVIRONMENT_STEP, STATE_ESTABLISHING,
+                                        ON_PAGE_INTERACTION)
+
+
+@pytest.mark.parametrize("step", [
+    "Initialize browser session",
+    "init session miniindia",
+    "1. Launch a new browser",
+    "InitSession",
+    "Close the browser",
+    "closesession",
+])
+def test_environment_steps(step):
+    assert classify_step(step) == ENVIRONMENT_STEP
+
+
+@pytest.mark.parametrize("step", [
+    "Navigate to https://www.miniindia.ie",
+    "Step 2: go to miniindia.ie",
+    "visit www.example.com/cart",
+    "Refresh the page",
+    "reload",
+    "go back",
+])
+def test_state_establishing_steps(step):
+    assert classify_step(step) == STATE_ESTABLISHING
+
+
+@pytest.mark.parametrize("step", [
+    "Click the Add to Cart button",
+    "Type K78A4E4 into the Eircode field",
+    "Verify the cart contains Coke",
+    "Close the modal",
+    # A url in an interaction does not make it a navigation
+    "Click the link to https://www.miniindia.ie/cart",
+])
+def test_interaction_steps(step):
+    assert classify_step(step) == ON_PAGE_INTERACTION
+
+
+@pytest.mark.parametrize("step", ["", "Find out whether delivery is available", "Navigate to the checkout page"])
+def test_unsure_steps_go_to_the_observer(step):
+    assert classify_step(step) is None
+
+
+def test_verdicts_match_the_observer_format():
+    assert "OBSERVATION:\nAPPROVED" in approved(STATE_ESTABLISHING, "session exists")
+    verdict = rejected(STATE_ESTABLISHING, "No active browser session 's1'", "InitSession with session_name s1")
+    assert "OBSERVATION:\nREJECTED" in verdict
+    assert "- InitSession with session_name s1" in verdict
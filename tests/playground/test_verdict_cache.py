@@ -0,0 +1,68 @@
+import io
+
+from PIL import Image
+
+from playground.page_fingerprint import page_fingerprint
+from playground.verdict_cache import VerdictCache
+
+APPROVED = "OBSERVATION:\nAPPROVED"
+HTML = "<html><body><button>Add to cart</button></body></html>"
+
+
+def fingerprint(url="https://shop.example/", html=HTML):
+    # A blank 1x1 png keeps the perceptual hash constant, only url and DOM vary
+    out = io.BytesIO()
+    Image.new("RGB", (1, 1)).save(out, format="PNG")
+    return page_fingerprint(url, html, out.getvalue())
+
+
+def test_hit_on_the_same_session_step_and_page():
+    cache = VerdictCache()
+    cache.put("s1", "Click  Add to cart", fingerprint(), APPROVED)
+    assert cache.get("s1", "click add to cart", fingerprint()) == APPROVED
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 0}
+
+
+def test_miss_when_url_or_dom_changed():
+    cache = VerdictCache()
+    cache.put("s1", "Click Add to cart", fingerprint(), APPROVED)
+    assert cache.get("s1", "Click Add to cart", fingerprint(url="https://shop.example/cart")) is None
+    assert cache.get("s1", "Click Add to cart", fingerprint(html=HTML.replace("Add", "Remove"))) is None
+
+
+def test_scripts_do_not_change_the_fingerprint():
+    noisy = HTML.replace("<body>", "<body><script>var t = Date.now();</script>")
+    assert fingerprint(html=noisy) == fingerprint()
+
+
+def test_miss_for_other_sessions_and_without_fingerprint():
+    cache = VerdictCache()
+    cache.put("s1", "Click Add to cart", fingerprint(), APPROVED)
+    assert cache.get("s2", "Click Add to cart", fingerprint()) is None
+    assert cache.get("s1", "Click Add to cart", None) is None
+
+
+def test_incomplete_verdicts_are_not_cached():
+    cache = VerdictCache()
+    cache.put("s1", "Click Add to cart", fingerprint(), "The observer ran out of tool calls")
+    cache.put("s1", "Click Add to cart", None, APPROVED)
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_drops_only_the_session():
+    cache = VerdictCache()
+    cache.put("s1", "Click Add to cart", fingerprint(), APPROVED)
+    cache.put("s2", "Click Add to cart", fingerprint(), APPROVED)
+    cache.invalidate("s1")
+    assert cache.get("s1", "Click Add to cart", fingerprint()) is None
+    assert cache.get("s2", "Click Add to cart", fingerprint()) == APPROVED
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = VerdictCache(max_entries=2)
+    for step in ("a", "b"):
+        cache.put("s1", step, fingerprint(), APPROVED)
+    cache.get("s1", "a", fingerprint())
+    cache.put("s1", "c", fingerprint(), APPROVED)
+    assert cache.get("s1", "b", fingerprint()) is None
+    assert cache.get("s1", "a", fingerprint()) == APPROVED
@@ -0,0 +1,81 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from playground import visual_cache
+from playground.visual_cache import VisualQueryCache, normalize_query
+
+PAGE = "https://shop.example/|dom1"
+
+
+def screenshot(box=None) -> bytes:
+    image = Image.new("RGB", (320, 240), "white")
+    if box:
+        ImageDraw.Draw(image).rectangle(box, fill="black")
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_normalize_query():
+    assert normalize_query("Is the  Cart EMPTY?") == "is the cart empty"
+
+
+def test_hit_for_the_same_session_page_and_query():
+    cache = VisualQueryCache()
+    image_hash = cache.image_hash(screenshot())
+    cache.put("s1", PAGE, image_hash, "Is the cart empty?", "yes")
+    assert cache.get("s1", PAGE, image_hash, "is the cart empty") == "yes"
+
+
+def test_near_identical_images_hit_within_tolerance():
+    cache = VisualQueryCache(tolerance=3)
+    cache.put("s1", PAGE, 0b1011, "Is the cart empty?", "yes")
+    assert cache.get("s1", PAGE, 0b0011, "Is the cart empty?") == "yes"
+    assert cache.stats()["near_hits"] == 1
+    assert cache.get("s1", PAGE, 0b0100, "Is the cart empty?") is None
+
+
+def test_changed_image_misses():
+    cache = VisualQueryCache()
+    cache.put("s1", PAGE, cache.image_hash(screenshot()), "Is a modal open?", "no")
+    modal = cache.image_hash(screenshot((60, 40, 260, 200)))
+    assert cache.get("s1", PAGE, modal, "Is a modal open?") is None
+
+
+def test_miss_for_another_session_url_or_dom():
+    cache = VisualQueryCache()
+    cache.put("s1", PAGE, 7, "Is the cart empty?", "yes")
+    assert cache.get("s2", PAGE, 7, "Is the cart empty?") is None
+    assert cache.get("s1", "https://shop.example/cart|dom1", 7, "Is the cart empty?") is None
+    assert cache.get("s1", "https://shop.example/|dom2", 7, "Is the cart empty?") is None
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(visual_cache.time, "monotonic", lambda: now[0])
+    cache = VisualQueryCache(ttl_seconds=60)
+    cache.put("s1", PAGE, 7, "Is the cart empty?", "yes")
+    now[0] += 59
+    assert cache.get("s1", PAGE, 7, "Is the cart empty?") == "yes"
+    now[0] += 2
+    assert cache.get("s1", PAGE, 7, "Is the cart empty?") is None
+
+
+def test_drop_session_after_a_mutating_action():
+    cache = VisualQueryCache()
+    cache.put("s1", PAGE, 7, "Is the cart empty?", "yes")
+    cache.put("s2", PAGE, 7, "Is the cart empty?", "no")
+    cache.drop_session("s1")
+    assert cache.get("s1", PAGE, 7, "Is the cart empty?") is None
+    assert cache.get("s2", PAGE, 7, "Is the cart empty?") == "no"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = VisualQueryCache(max_entries=2, tolerance=0)
+    cache.put("s1", PAGE, 1, "a", "1")
+    cache.put("s1", PAGE, 2, "b", "2")
+    cache.get("s1", PAGE, 1, "a")
+    cache.put("s1", PAGE, 3, "c", "3")
+    assert cache.get("s1", PAGE, 2, "b") is None
+    assert cache.get("s1", PAGE, 1, "a") == "1"
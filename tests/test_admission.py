@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def test_requests_start_while_slots_are_free():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2)
+        first, second = admission.enter(), admission.enter()
+        assert first.position == second.position == 0
+        assert admission.metrics()["in_flight"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_queue_is_fifo_and_hands_slots_over():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        running = admission.enter()
+        order = []
+
+        async def queued(name):
+            ticket = admission.enter()
+            async with ticket:
+                order.append(name)
+
+        tasks = [asyncio.create_task(queued(name)) for name in ("a", "b")]
+        await asyncio.sleep(0)
+        assert admission.metrics()["queued"] == 2
+        async with running:
+            pass
+        await asyncio.gather(*tasks)
+        assert order == ["a", "b"]
+        assert admission.metrics()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_estimated_wait_uses_recent_durations():
+    admission = AdmissionController(max_in_flight=2, default_duration=60)
+    assert admission.estimate_wait(3) == 120
+    admission.durations.extend([10, 30])
+    assert admission.estimate_wait(1) == 20
+
+
+def test_rejects_when_queue_is_full():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=1)
+        admission.enter()
+        admission.enter()
+        with pytest.raises(Overloaded, match="queue is full"):
+            admission.enter()
+        assert admission.metrics()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_the_wait_is_too_long():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_wait_seconds=30, default_duration=60)
+        admission.enter()
+        with pytest.raises(Overloaded) as rejected:
+            admission.enter()
+        assert rejected.value.estimated_wait == 60
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_tickets_give_back_their_place():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        running = admission.enter()
+        queued = admission.enter()
+        queued.abandon()
+        assert admission.metrics()["queued"] == 0
+        running.abandon()
+        assert admission.metrics()["in_flight"] == 0
+
+    asyncio.run(scenario())
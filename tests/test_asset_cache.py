@@ -0,0 +1,135 @@
+import asyncio
+import time
+
+import pytest
+
+from asset_cache import SharedAssetCache, cacheable_request, freshness_lifetime, shareable_response
+
+PUBLIC = {"cache-control": "public, max-age=600", "content-type": "text/css"}
+
+
+@pytest.mark.parametrize("cache_control,lifetime", [
+    ("max-age=600", 600),
+    ("public, s-maxage=60, max-age=600", 60),
+    ('max-age="30"', 30),
+    ("max-age=0", None),
+    ("private, max-age=600", None),
+    ("no-store", None),
+    ("no-cache, max-age=600", None),
+    ("max-age=soon", None),
+    ("", None),
+])
+def test_freshness_lifetime(cache_control, lifetime):
+    assert freshness_lifetime({"cache-control": cache_control}) == lifetime
+
+
+def test_shareable_responses():
+    assert shareable_response(200, PUBLIC)
+    assert not shareable_response(404, PUBLIC)
+    assert not shareable_response(200, dict(PUBLIC, **{"set-cookie": "sid=1"}))
+    assert not shareable_response(200, dict(PUBLIC, vary="Cookie"))
+    assert not shareable_response(200, dict(PUBLIC, vary="*"))
+
+
+def test_requests_with_credentials_are_not_cacheable():
+    assert cacheable_request({"accept": "text/css"})
+    assert not cacheable_request({"Cookie": "sid=1"})
+    assert not cacheable_request({"authorization": "Bearer x"})
+
+
+class FakeRequest:
+    def __init__(self, url, headers=None, method="GET", resource_type="stylesheet"):
+        self.url = url
+        self.method = method
+        self.resource_type = resource_type
+        self._headers = headers or {}
+        # Like playwright, request.headers leaves out the cookies the browser adds
+        self.headers = {name: value for name, value in self._headers.items() if name != "cookie"}
+
+    async def all_headers(self):
+        return self._headers
+
+
+class FakeResponse:
+    status = 200
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    async def body(self):
+        return b"body{}"
+
+
+class FakeRoute:
+    def __init__(self, headers=PUBLIC):
+        self.response_headers = headers
+        self.fetched = 0
+        self.continued = 0
+        self.fulfilled = []
+
+    async def continue_(self):
+        self.continued += 1
+
+    async def fetch(self):
+        self.fetched += 1
+        return FakeResponse(self.response_headers)
+
+    async def fulfill(self, **kwargs):
+        self.fulfilled.append(kwargs)
+
+
+def route(cache, request, response_headers=PUBLIC) -> FakeRoute:
+    fake = FakeRoute(response_headers)
+    asyncio.run(cache.handle_route(fake, request))
+    return fake
+
+
+def test_second_request_is_served_from_the_cache(tmp_path):
+    cache = SharedAssetCache(str(tmp_path))
+    first = route(cache, FakeRequest("https://cdn.example/app.css"))
+    second = route(cache, FakeRequest("https://cdn.example/app.css"))
+    assert (first.fetched, second.fetched) == (1, 0)
+    assert second.fulfilled[0]["body"] == b"body{}"
+    assert cache.metrics()["hits"] == 1
+
+
+@pytest.mark.parametrize("headers", [{"cookie": "sid=1"}, {"authorization": "Bearer x"}])
+def test_requests_with_credentials_pass_through(tmp_path, headers):
+    cache = SharedAssetCache(str(tmp_path))
+    fake = route(cache, FakeRequest("https://cdn.example/private.css", headers))
+    assert (fake.continued, fake.fetched) == (1, 0)
+    assert cache.metrics()["stores"] == 0
+
+
+def test_dynamic_requests_pass_through(tmp_path):
+    cache = SharedAssetCache(str(tmp_path))
+    assert route(cache, FakeRequest("https://shop.example/api", resource_type="fetch")).continued == 1
+    assert route(cache, FakeRequest("https://cdn.example/app.css", method="POST")).continued == 1
+
+
+def test_uncacheable_responses_are_fetched_every_time(tmp_path):
+    cache = SharedAssetCache(str(tmp_path))
+    for _ in range(2):
+        fake = route(cache, FakeRequest("https://cdn.example/app.css"), {"cache-control": "private, max-age=600"})
+        assert fake.fetched == 1
+    assert cache.metrics()["stores"] == 0
+
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    cache = SharedAssetCache(str(tmp_path))
+    assert asyncio.run(cache.put("https://cdn.example/a.js", 200, {"Cache-Control": "max-age=60"}, b"a"))
+    stored_at = time.time()
+    monkeypatch.setattr("asset_cache.time.time", lambda: stored_at + 61)
+    assert asyncio.run(cache.get("https://cdn.example/a.js")) is None
+    assert cache.metrics()["disk_entries"] == 0
+
+
+def test_disk_is_trimmed_and_reloaded(tmp_path):
+    cache = SharedAssetCache(str(tmp_path), max_memory_bytes=10, max_disk_bytes=25)
+    for name in "abcd":
+        asyncio.run(cache.put(f"https://cdn.example/{name}.js", 200, {"cache-control": "max-age=60"}, b"x" * 10))
+    assert cache.metrics()["disk_bytes"] == 20
+    reloaded = SharedAssetCache(str(tmp_path))
+    assert reloaded.metrics()["disk_entries"] == 2
+    assert asyncio.run(reloaded.get("https://cdn.example/d.js")).body == b"x" * 10
+    assert asyncio.run(reloaded.get("https://cdn.example/a.js")) is None
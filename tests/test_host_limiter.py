@@ -0,0 +1,99 @@
+import asyncio
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from host_limiter import HostLimiter, parse_retry_after
+
+
+def test_parse_retry_after_seconds_and_dates():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("-5") == 0
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_concurrency_is_limited_per_host():
+    async def scenario():
+        limiter = HostLimiter(max_concurrent=2, min_interval=0)
+        running, peak = {"a.example": 0, "b.example": 0}, {"a.example": 0, "b.example": 0}
+
+        async def navigate(host):
+            async with limiter.slot(f"https://{host}/page"):
+                running[host] += 1
+                peak[host] = max(peak[host], running[host])
+                await asyncio.sleep(0.01)
+                running[host] -= 1
+
+        await asyncio.gather(*(navigate(host) for host in ["a.example"] * 5 + ["b.example"]))
+        assert peak == {"a.example": 2, "b.example": 1}
+        assert limiter.metrics()["a.example"]["navigations"] == 5
+
+    asyncio.run(scenario())
+
+
+def test_starts_are_spaced_after_the_burst():
+    async def scenario():
+        limiter = HostLimiter(max_concurrent=10, min_interval=0.05, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            async with limiter.slot("https://a.example/"):
+                pass
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
+
+
+def test_throttle_pauses_the_host_only():
+    async def scenario():
+        limiter = HostLimiter(min_interval=0)
+        assert limiter.throttle("https://a.example/", 0.1) == 0.1
+        started = time.monotonic()
+        async with limiter.slot("https://b.example/"):
+            other = time.monotonic() - started
+        async with limiter.slot("https://a.example/"):
+            throttled = time.monotonic() - started
+        return other, throttled
+
+    other, throttled = asyncio.run(scenario())
+    assert other < 0.05
+    assert throttled >= 0.09
+
+
+def test_throttle_caps_retry_after():
+    limiter = HostLimiter(max_retry_after=10)
+    assert limiter.throttle("https://a.example/", 3600) == 10
+    assert limiter.metrics()["a.example"]["throttled"] == 1
+
+
+class FakePage:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    async def goto(self, url, **options):
+        self.calls += 1
+        return SimpleNamespace(status=self.statuses.pop(0), headers={"retry-after": "0.05"})
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_navigate_retries_after_429_and_503(status):
+    browse_manager = pytest.importorskip("browse_manager")
+    manager = SimpleNamespace(host_limiter=HostLimiter(min_interval=0))
+    page = FakePage([status, 200])
+    response = asyncio.run(browse_manager.BrowserManager.navigate(manager, page, "https://a.example/"))
+    assert response.status == 200
+    assert page.calls == 2
+    assert manager.host_limiter.metrics()["a.example"]["throttled"] == 1
+
+
+def test_navigate_gives_up_after_the_retries():
+    browse_manager = pytest.importorskip("browse_manager")
+    manager = SimpleNamespace(host_limiter=HostLimiter(min_interval=0))
+    page = FakePage([429, 429, 200])
+    response = asyncio.run(browse_manager.BrowserManager.navigate(manager, page, "https://a.example/", retries=1))
+    assert response.status == 429
+    assert page.calls == 2
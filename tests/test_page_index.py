@@ -0,0 +1,93 @@
+import threading
+
+from page_index import BM25Index, PageIndex, PageIndexes, chunk_html, MAX_CHUNK_CHARS
+
+PAGE = """<html><head><title>Shop</title><script>var ignored = "cart";</script></head><body>
+<nav><a href="/cart">Cart</a></nav>
+<main>
+  <h1>Coca-Cola 330ml</h1>
+  <p>Price <b>1.20</b> EUR</p>
+  <button id="add-to-cart">Add to cart</button>
+  <form><input name="eircode" placeholder="Eircode"><button>Check delivery</button></form>
+  <ul><li>Collection<li>Delivery</ul>
+</main>
+</body></html>"""
+
+
+def test_chunks_follow_the_dom_with_selectors():
+    chunks = {chunk.text: chunk for chunk in chunk_html(PAGE)}
+    assert chunks["Add to cart"].ref == "#add-to-cart"
+    assert chunks["Price 1.20 EUR"].tag == "p"
+    assert chunks["Price 1.20 EUR"].ref.endswith("main:nth-of-type(1) > p:nth-of-type(1)")
+    assert chunks["placeholder=Eircode name=eircode"].tag == "input"
+    # Unclosed list items are closed by the next one
+    assert {"Collection", "Delivery"} <= chunks.keys()
+
+
+def test_scripts_and_head_are_skipped():
+    assert not any("ignored" in chunk.text or chunk.text == "Shop" for chunk in chunk_html(PAGE))
+
+
+def test_long_text_is_split():
+    chunks = chunk_html(f"<p>{'word ' * MAX_CHUNK_CHARS}</p>")
+    assert len(chunks) > 1
+    assert all(len(chunk.text) <= MAX_CHUNK_CHARS for chunk in chunks)
+    assert len({chunk.key for chunk in chunks}) == len(chunks)
+
+
+def test_bm25_ranks_rarer_and_denser_matches_first():
+    index = BM25Index()
+    index.add("a", "delivery delivery options")
+    index.add("b", "delivery to your door and many other words about the shop")
+    index.add("c", "collection in store")
+    assert [key for key, _ in index.search("delivery", 3)] == ["a", "b"]
+    assert index.search("collection delivery", 1)[0][0] in ("a", "c")
+    index.remove("a")
+    assert [key for key, _ in index.search("delivery", 3)] == ["b"]
+    assert index.search("unknown", 3) == []
+
+
+def test_page_search_returns_refs():
+    index = PageIndex(embedding_model=None)
+    index.update(PAGE)
+    top = index.search("add to cart button", k=1)[0]
+    assert top["ref"] == "#add-to-cart"
+
+
+def test_update_only_reindexes_changed_chunks():
+    index = PageIndex(embedding_model=None)
+    assert index.update(PAGE, "v1")[1] == 0
+    assert index.update(PAGE, "v1") == (0, 0)
+    added, removed = index.update(PAGE.replace("1.20", "1.50"), "v2")
+    assert (added, removed) == (1, 1)
+    assert index.search("1.50", k=1)[0]["text"] == "Price 1.50 EUR"
+
+
+def test_set_page_is_indexed_on_the_next_search():
+    indexes = PageIndexes()
+    indexes.set_page("s1", PAGE)
+    assert indexes.get("s1").chunks == {}
+    assert indexes.search("s1", "eircode", k=1)[0]["tag"] == "input"
+
+
+def test_concurrent_updates_and_searches():
+    index = PageIndex(embedding_model=None)
+    errors = []
+
+    def update():
+        for version in range(30):
+            index.update(PAGE.replace("1.20", str(version)), str(version))
+
+    def search():
+        for _ in range(60):
+            try:
+                index.search("price delivery")
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=target) for target in (update, search, search)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
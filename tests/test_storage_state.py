@@ -0,0 +1,89 @@
+import os
+import time
+
+from storage_state import (StorageStateStore, storage_profile, profile_host, state_for_host, merge_states,
+                           STATE_FORMAT_VERSION)
+
+STATE = {
+    "cookies": [
+        {"name": "consent", "value": "1", "domain": ".shop.example", "path": "/", "expires": -1},
+        {"name": "sid", "value": "a", "domain": "login.shop.example", "path": "/", "expires": -1},
+        {"name": "tracker", "value": "x", "domain": ".ads.example", "path": "/", "expires": -1},
+    ],
+    "origins": [
+        {"origin": "https://shop.example", "localStorage": [{"name": "eircode", "value": "K78"}]},
+        {"origin": "https://ads.example", "localStorage": [{"name": "id", "value": "x"}]},
+    ],
+}
+
+
+def test_profiles_are_keyed_by_profile_id_and_host():
+    assert storage_profile("alice", "Shop.Example") == "alice/shop.example"
+    assert profile_host(storage_profile("alice", "shop.example")) == "shop.example"
+    assert storage_profile("alice", "shop.example") != storage_profile("bob", "shop.example")
+
+
+def test_state_for_host_keeps_only_what_the_host_sees():
+    state = state_for_host(STATE, "shop.example")
+    assert [cookie["name"] for cookie in state["cookies"]] == ["consent"]
+    assert [origin["origin"] for origin in state["origins"]] == ["https://shop.example"]
+    subdomain = state_for_host(STATE, "login.shop.example")
+    assert [cookie["name"] for cookie in subdomain["cookies"]] == ["consent", "sid"]
+
+
+def test_merge_states_later_cookies_win():
+    old = {"cookies": [dict(STATE["cookies"][0], value="0")], "origins": []}
+    merged = merge_states([old, state_for_host(STATE, "shop.example")])
+    assert [cookie["value"] for cookie in merged["cookies"]] == ["1"]
+    assert merge_states([]) is None
+
+
+def test_a_saved_profile_is_loaded_by_any_session_with_the_same_id(tmp_path):
+    profile = storage_profile("alice", "shop.example")
+    StorageStateStore(str(tmp_path)).save(profile, state_for_host(STATE, "shop.example"))
+    # A store of a later process, the profile is found on disk by its id and host
+    loaded = StorageStateStore(str(tmp_path)).load(profile)
+    assert loaded["origins"][0]["localStorage"] == [{"name": "eircode", "value": "K78"}]
+    assert StorageStateStore(str(tmp_path)).load(storage_profile("bob", "shop.example")) is None
+
+
+def test_versions_are_written_only_on_change_and_pruned(tmp_path):
+    store = StorageStateStore(str(tmp_path), keep_versions=2)
+    profile = storage_profile("alice", "shop.example")
+    assert store.save(profile, STATE) == 1
+    assert store.save(profile, STATE) is None
+    for value in ("2", "3"):
+        store.save(profile, {"cookies": [dict(STATE["cookies"][0], value=value)], "origins": []})
+    assert store.versions(profile) == [3, 2]
+    assert store.load(profile)["cookies"][0]["value"] == "3"
+
+
+def test_expired_versions_and_cookies_are_not_loaded(tmp_path, monkeypatch):
+    store = StorageStateStore(str(tmp_path), ttl_seconds=60)
+    profile = storage_profile("alice", "shop.example")
+    past = {"name": "old", "value": "1", "domain": "shop.example", "path": "/", "expires": 1}
+    store.save(profile, {"cookies": [STATE["cookies"][0], past], "origins": []})
+    assert [cookie["name"] for cookie in store.load(profile)["cookies"]] == ["consent"]
+    saved_at = time.time()
+    monkeypatch.setattr("storage_state.time.time", lambda: saved_at + 120)
+    assert store.load(profile) is None
+    assert store.expire() == 1
+
+
+def test_profile_parts_cannot_leave_the_root(tmp_path):
+    store = StorageStateStore(str(tmp_path / "root"))
+    store.save("../../escape/..", STATE)
+    written = [os.path.join(path, name) for path, _, names in os.walk(tmp_path) for name in names]
+    assert written and all(path.startswith(str(tmp_path / "root")) for path in written)
+
+
+def test_older_formats_are_ignored(tmp_path):
+    store = StorageStateStore(str(tmp_path))
+    profile = storage_profile("alice", "shop.example")
+    store.save(profile, STATE)
+    path = store._path(profile, 1)
+    with open(path) as f:
+        record = f.read()
+    with open(path, "w") as f:
+        f.write(record.replace(f'"format": {STATE_FORMAT_VERSION}', '"format": 1'))
+    assert store.load(profile) is None
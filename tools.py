@@ -1,29 +1,52 @@
-
+import os
+import time
+from typing import Optional
+from urllib.parse import urlparse
 
 from strands import tool, ToolContext, Agent
 from strands.types.tools import ToolUse
 
-from browse_manager import browser_manager
+from artifacts import artifact_store, ARTIFACT_INLINE_CHARS
+from browse_manager import browser_manager, time_left, BrowserTimeout, SessionBusy, CLEANUP_TIMEOUT
+from page_index import page_indexes
+from readiness import page_readiness
+from storage_state import storage_profile
 
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+# Deadline of one browse call, shared by all browser operations it makes
+BROWSE_TIMEOUT_SECONDS = float(os.getenv("BROWSE_TIMEOUT_SECONDS", "60"))
+# Storage state profile of sessions without a profile_id in their invocation state, unset keeps them cold
+STORAGE_PROFILE_ID = os.getenv("STORAGE_PROFILE_ID")
 
-def browse_sync(url: str, session_id: str) -> str:
-    page = browser_manager.new_page_sync(session_id)
 
-    try:
-        asyncio.run_coroutine_threadsafe(
-            page.goto(url),
-            browser_manager.loop
-        ).result()
+async def open_page(page, url: str, deadline: float) -> str:
+    # DOMContentLoaded plus the readiness checks, slow ads and images don't hold the page back
+    await browser_manager.navigate(page, url, wait_until="domcontentloaded", timeout=time_left(deadline) * 1000)
+    await page_readiness.wait_ready(page, f"browse {url}",
+                                    timeout_ms=int(min(page_readiness.timeout_ms, time_left(deadline) * 1000)))
+    return await page.content()
+
 
-        content = asyncio.run_coroutine_threadsafe(
-            page.content(),
-            browser_manager.loop
-        ).result()
+def browse_sync(url: str, session_id: str, timeout: float = BROWSE_TIMEOUT_SECONDS,
+                profile_id: Optional[str] = None) -> str:
+    deadline = time.monotonic() + timeout
+    # The state of the site saved by earlier sessions of the same profile id, consent banners and logins included
+    host = urlparse(url).hostname
+    profile = storage_profile(profile_id, host) if host and profile_id else None
+    page = browser_manager.new_page_sync(session_id, profile=profile, timeout=time_left(deadline))
 
+    try:
+        content = browser_manager.run_sync(open_page(page, url, deadline), session_id, timeout=time_left(deadline))
+
+        try:
+            if profile:
+                browser_manager.save_storage_state_sync(session_id, profile,
+                                                        timeout=min(CLEANUP_TIMEOUT, time_left(deadline)))
+        except Exception as ex:
+            logging.warning(f"Saving storage state failed: {ex}")
         return content
 
     finally:
@@ -33,18 +56,37 @@ def browse_sync(url: str, session_id: str) -> str:
 @tool(context=True)
 def browse(url: str, tool_context: ToolContext) -> str:
     """
-    Open a web page and return its HTML content
+    Open a web page and return its HTML content.
+    Large pages are returned as an artifact handle, search them with grep_artifact and read_artifact.
     """
 
     try:
         logging.info(f"opening {url}")
         session_id = tool_context.invocation_state.get("session_id", "asd")
-        return browse_sync(url, session_id)
+        profile_id = tool_context.invocation_state.get("profile_id") or STORAGE_PROFILE_ID
+        content = browse_sync(url, session_id, profile_id=profile_id)
+        # Indexed only once search_page is called
+        page_indexes.set_page(session_id, content)
+        if len(content) > ARTIFACT_INLINE_CHARS:
+            return artifact_store.describe(artifact_store.put(session_id, content, "html"))
+        return content
+    except (BrowserTimeout, SessionBusy) as ex:
+        logging.warning(f'Browse of {url} aborted: {ex}')
+        return f'Error: {ex}'
     except Exception as ex:
         logging.error(f'Browse error {ex}')
     return ''
 
-import asyncio
+
+@tool(context=True)
+def search_page(query: str, tool_context: ToolContext, k: int = 5):
+    """
+    Search the text of the page last opened with browse and return the k most relevant chunks,
+    each with the CSS selector of its element in "ref".
+    """
+    session_id = tool_context.invocation_state.get("session_id", "asd")
+    return page_indexes.search(session_id, query, k)
+
 
 def main():
     tool_context = ToolContext(tool_use=ToolUse(input="", name="browse", toolUseId="asd"), agent=Agent(),